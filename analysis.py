@@ -1,11 +1,17 @@
 # -*- coding: utf-8 -*-
 
+from copy import deepcopy
 from google.cloud import language
+from google.cloud.language.entity import Entity
+from google.cloud.language.sentiment import Sentiment
+from hashlib import sha1
+from os import path
 from re import compile
 from re import IGNORECASE
 from requests import get
 from urllib import quote_plus
 
+from cache import Cache
 from logs import Logs
 
 # The URL for a GET request to the Wikidata API. The string parameter is the
@@ -38,23 +44,191 @@ MID_TO_TICKER_QUERY = (
     '  }'
     ' } GROUP BY ?companyLabel ?rootLabel ?tickerLabel ?exchangeNameLabel')
 
+# A Wikidata SPARQL query like MID_TO_TICKER_QUERY for multiple companies at
+# once. The string parameter is a space-separated list of quoted Freebase IDs.
+MIDS_TO_TICKER_QUERY = (
+    'SELECT ?mid ?companyLabel ?rootLabel ?tickerLabel ?exchangeNameLabel'
+    ' WHERE {'
+    '  VALUES ?mid { %s } .'  # All specified Freebase IDs.
+    '  ?entity wdt:P646 ?mid .'  # Entity with one of the Freebase IDs.
+    '  ?entity wdt:P176* ?manufacturer .'  # Entity may be product.
+    '  ?manufacturer wdt:P156* ?company .'  # Company may have restructured.
+    '  { ?company p:P414 ?exchange } UNION'  # Company traded on exchange or...
+    '  { ?company wdt:P127+ / wdt:P156* ?root .'  # ... company has owner.
+    '    ?root p:P414 ?exchange } UNION'  # Owner traded on exchange or ...
+    '  { ?company wdt:P749+ / wdt:P156* ?root .'  # ... company has parent.
+    '    ?root p:P414 ?exchange } .'  # Parent traded on exchange.
+    '  VALUES ?exchanges { wd:Q13677 wd:Q82059 } .'  # Whitelist NYSE, NASDAQ.
+    '  ?exchange ps:P414 ?exchanges .'  # Stock exchange is whitelisted.
+    '  ?exchange pq:P249 ?ticker .'  # Get ticker symbol.
+    '  ?exchange ps:P414 ?exchangeName .'  # Get name of exchange.
+    '  FILTER NOT EXISTS { ?company wdt:P31 /'
+    '                               wdt:P279* wd:Q1616075 } .'  # Blacklist TV.
+    '  FILTER NOT EXISTS { ?company wdt:P31 /'
+    '                               wdt:P279* wd:Q11032 } .'  # Blacklist news.
+    '  SERVICE wikibase:label {'
+    '   bd:serviceParam wikibase:language "en" .'  # Use English labels.
+    '  }'
+    ' } GROUP BY ?mid ?companyLabel ?rootLabel ?tickerLabel'
+    '   ?exchangeNameLabel')
+
+# The path to the SQLite file persisting company data across restarts.
+COMPANY_DATA_CACHE_FILE = "/tmp/trump2cash-company-data.db"
+
+# The maximum number of MIDs to keep company data for.
+COMPANY_DATA_CACHE_SIZE = 10000
+
+# The time in seconds after which company data is looked up again.
+COMPANY_DATA_CACHE_TTL = 7 * 24 * 60 * 60
+
+# The path to the SQLite file persisting the companies found in tweets.
+TWEET_ANALYSIS_CACHE_FILE = "/tmp/trump2cash-tweet-analysis.db"
+
+# The maximum number of tweets to keep the found companies for.
+TWEET_ANALYSIS_CACHE_SIZE = 100000
+
+
+def get_analysis_fingerprint():
+    """Hashes the source of this module, so that results of an older version
+    of the analysis aren't reused.
+    """
+
+    source_file = open("%s.py" % path.splitext(__file__)[0], "rb")
+    try:
+        return sha1(source_file.read()).hexdigest()
+    finally:
+        source_file.close()
+
+
+# The fingerprint of the current version of the analysis.
+ANALYSIS_FINGERPRINT = get_analysis_fingerprint()
+
+
+def make_company_data_cache(filename=COMPANY_DATA_CACHE_FILE):
+    """Creates the cache for company data. It is thread-safe, so it can be
+    shared by the Analysis instances of multiple threads.
+    """
+
+    return Cache(max_entries=COMPANY_DATA_CACHE_SIZE,
+                 ttl=COMPANY_DATA_CACHE_TTL, filename=filename,
+                 table="company_data")
+
+
+def make_tweet_analysis_cache(filename=TWEET_ANALYSIS_CACHE_FILE):
+    """Creates the cache for the companies found in tweets. It is
+    thread-safe, so it can be shared by the Analysis instances of multiple
+    threads.
+    """
+
+    return Cache(max_entries=TWEET_ANALYSIS_CACHE_SIZE, filename=filename,
+                 table="tweet_analysis")
+
 
 class Analysis:
     """A helper for analyzing company data in text."""
 
-    def __init__(self, logs_to_cloud):
+    def __init__(self, logs_to_cloud,
+                 company_data_cache_file=COMPANY_DATA_CACHE_FILE,
+                 tweet_analysis_cache_file=TWEET_ANALYSIS_CACHE_FILE,
+                 company_data_cache=None, tweet_analysis_cache=None):
         self.logs = Logs(name="analysis", to_cloud=logs_to_cloud)
         self.gcnl_client = language.Client()
 
+        # Use the given caches if they are shared with other instances.
+        if company_data_cache is None:
+            company_data_cache = make_company_data_cache(
+                company_data_cache_file)
+        self.company_data_cache = company_data_cache
+
+        # The persisted companies found in tweets are only needed for
+        # backtests, so they are loaded on first use.
+        self.tweet_analysis_cache_file = tweet_analysis_cache_file
+        self.tweet_analysis_cache = tweet_analysis_cache
+
     def get_company_data(self, mid):
         """Looks up stock ticker information for a company via its Freebase ID.
         """
 
+        # Use the cached company data, which is None for MIDs without any.
+        # Return a copy since the callers modify the data.
+        try:
+            datas = self.company_data_cache.get(mid)
+            self.logs.debug("Using cached company data for MID: %s", mid)
+            return deepcopy(datas)
+        except KeyError:
+            pass
+
         query = MID_TO_TICKER_QUERY % mid
         bindings = self.make_wikidata_request(query)
 
+        # Don't cache failed requests, only empty results.
+        if bindings is None:
+            self.logs.error("Failed to look up company data for MID: %s", mid)
+            return None
+
+        datas = self.parse_company_data(bindings)
+        if not datas:
+            self.logs.debug("No company data found for MID: %s", mid)
+
+        self.company_data_cache.put(mid, datas)
+        return deepcopy(datas)
+
+    def get_companies_data(self, mids):
+        """Looks up stock ticker information for multiple companies via their
+        Freebase IDs with a single request. Returns the company data by MID or
+        None if the request failed.
+        """
+
+        # Use the cached company data and only look up the rest.
+        companies_data = {}
+        missing_mids = []
+        for mid in mids:
+            try:
+                datas = self.company_data_cache.get(mid)
+                self.logs.debug("Using cached company data for MID: %s", mid)
+                companies_data[mid] = deepcopy(datas)
+            except KeyError:
+                if mid not in missing_mids:
+                    missing_mids.append(mid)
+
+        if not missing_mids:
+            return companies_data
+
+        values = " ".join(['"%s"' % mid for mid in missing_mids])
+        query = MIDS_TO_TICKER_QUERY % values
+        bindings = self.make_wikidata_request(query)
+
+        # Don't cache failed requests, only empty results.
+        if bindings is None:
+            self.logs.error("Failed to look up company data for MIDs: %s",
+                            missing_mids)
+            return None
+
+        # Split the response by MID.
+        mid_bindings = dict([(mid, []) for mid in missing_mids])
+        for binding in bindings:
+            try:
+                mid = binding["mid"]["value"]
+                mid_bindings[mid].append(binding)
+            except KeyError:
+                self.logs.warn("Skipping binding without MID: %s", binding)
+
+        for mid in missing_mids:
+            datas = self.parse_company_data(mid_bindings[mid])
+            if not datas:
+                self.logs.debug("No company data found for MID: %s", mid)
+
+            self.company_data_cache.put(mid, datas)
+            companies_data[mid] = deepcopy(datas)
+
+        return companies_data
+
+    def parse_company_data(self, bindings):
+        """Collects the company data from the Wikidata response bindings for a
+        single MID.
+        """
+
         if not bindings:
-            self.logs.debug("No company data found for MID: %s" % mid)
             return None
 
         # Collect the data from the response.
@@ -90,10 +264,10 @@ class Analysis:
 
             # Add to the list unless we already have the same entry.
             if data not in datas:
-                self.logs.debug("Adding company data: %s" % data)
+                self.logs.debug("Adding company data: %s", data)
                 datas.append(data)
             else:
-                self.logs.warn("Skipping duplicate company data: %s" % data)
+                self.logs.warn("Skipping duplicate company data: %s", data)
 
         return datas
 
@@ -108,46 +282,67 @@ class Analysis:
         # entity detection.
         text = self.get_expanded_text(tweet)
         if not text:
-            self.logs.error("Failed to get text from tweet: %s" % tweet)
+            self.logs.error("Failed to get text from tweet: %s", tweet)
             return None
 
-        # Run entity detection.
-        document = self.gcnl_client.document_from_text(text)
-        entities = document.analyze_entities()
-        self.logs.debug("Found entities: %s" %
+        # Run entity detection and sentiment analysis with a single request.
+        annotations = self.annotate_text(text)
+        if not annotations:
+            self.logs.error("Failed to annotate text: %s", text)
+            return None
+        entities, document_sentiment = annotations
+        self.logs.debug(lambda: "Found entities: %s" %
                         self.entities_tostring(entities))
 
-        # Collect all entities which are publicly traded companies, i.e.
-        # entities which have a known stock ticker symbol.
-        companies = []
-        for entity in entities:
+        # The sentiment is the same for all companies in the tweet.
+        sentiment = document_sentiment.score
+        self.logs.debug(
+            "Sentiment score and magnitude for text: %s %s \"%s\"",
+            sentiment, document_sentiment.magnitude, text)
 
-            # Use the Freebase ID of the entity to find company data. Skip any
-            # entity which doesn't have a Freebase ID (unless we find one via
-            # the Twitter handle).
+        # Collect the Freebase IDs of all entities. Skip any entity which
+        # doesn't have a Freebase ID (unless we find one via the Twitter
+        # handle).
+        entity_mids = []
+        for entity in entities:
             name = entity.name
             metadata = entity.metadata
             try:
                 mid = metadata["mid"]
             except KeyError:
-                self.logs.debug("No MID found for entity: %s" % name)
+                self.logs.debug("No MID found for entity: %s", name)
                 continue
+            entity_mids.append((name, mid))
+
+        # Look up the company data for all entities with a single request.
+        if entity_mids:
+            companies_data = self.get_companies_data(
+                [mid for name, mid in entity_mids])
+            if companies_data is None:
+                self.logs.error("Failed to get company data for tweet: %s",
+                                tweet)
+                return None
+        else:
+            companies_data = {}
 
-            company_data = self.get_company_data(mid)
+        # Collect all entities which are publicly traded companies, i.e.
+        # entities which have a known stock ticker symbol.
+        companies = []
+        for name, mid in entity_mids:
+            company_data = companies_data[mid]
 
             # Skip any entity for which we can't find any company data.
             if not company_data:
-                self.logs.debug("No company data found for entity: %s (%s)" %
-                                (name, mid))
+                self.logs.debug("No company data found for entity: %s (%s)",
+                                name, mid)
                 continue
-            self.logs.debug("Found company data: %s" % company_data)
+            self.logs.debug("Found company data: %s", company_data)
 
             for company in company_data:
 
-                # Extract and add a sentiment score.
-                sentiment = self.get_sentiment(text)
-                self.logs.debug("Using sentiment for company: %s %s" %
-                                (sentiment, company))
+                # Add the sentiment score.
+                self.logs.debug("Using sentiment for company: %s %s",
+                                sentiment, company)
                 company["sentiment"] = sentiment
 
                 # Add the company to the list unless we already have the same
@@ -157,10 +352,46 @@ class Analysis:
                     companies.append(company)
                 else:
                     self.logs.warn(
-                        "Skipping company with duplicate ticker: %s" % company)
+                        "Skipping company with duplicate ticker: %s", company)
 
         return companies
 
+    def find_companies_cached(self, tweet):
+        """Finds mentions of companies in a tweet like find_companies, but
+        reuses the persisted results from the same version of the analysis.
+        """
+
+        if not tweet:
+            self.logs.warn("No tweet to find companies.")
+            return None
+
+        if self.tweet_analysis_cache is None:
+            self.tweet_analysis_cache = make_tweet_analysis_cache(
+                self.tweet_analysis_cache_file)
+
+        # Return a copy since the callers may modify the companies.
+        tweet_id = tweet["id_str"]
+        try:
+            analysis = self.tweet_analysis_cache.get(tweet_id)
+            if analysis["fingerprint"] == ANALYSIS_FINGERPRINT:
+                self.logs.debug("Using cached companies for tweet: %s",
+                                tweet_id)
+                return deepcopy(analysis["companies"])
+            self.logs.debug("Outdated cached companies for tweet: %s",
+                            tweet_id)
+        except KeyError:
+            pass
+
+        # Don't cache failures.
+        companies = self.find_companies(tweet)
+        if companies is None:
+            return None
+
+        self.tweet_analysis_cache.put(tweet_id, {
+            "fingerprint": ANALYSIS_FINGERPRINT,
+            "companies": companies})
+        return deepcopy(companies)
+
     def get_expanded_text(self, tweet):
         """Retrieves the text from a tweet with any @mentions expanded to
         their full names.
@@ -174,19 +405,19 @@ class Analysis:
             text = tweet["text"]
             mentions = tweet["entities"]["user_mentions"]
         except KeyError:
-            self.logs.error("Malformed tweet: %s" % tweet)
+            self.logs.error("Malformed tweet: %s", tweet)
             return None
 
-        self.logs.debug("Using mentions: %s" % mentions)
+        self.logs.debug("Using mentions: %s", mentions)
         for mention in mentions:
             try:
                 screen_name = "@%s" % mention["screen_name"]
                 name = mention["name"]
             except KeyError:
-                self.logs.warn("Malformed mention: %s" % mention)
+                self.logs.warn("Malformed mention: %s", mention)
                 continue
 
-            self.logs.debug("Expanding mention: %s %s" % (screen_name, name))
+            self.logs.debug("Expanding mention: %s %s", screen_name, name)
             pattern = compile(screen_name, IGNORECASE)
             text = pattern.sub(name, text)
 
@@ -196,21 +427,21 @@ class Analysis:
         """Makes a request to the Wikidata SPARQL API."""
 
         query_url = WIKIDATA_QUERY_URL % quote_plus(query)
-        self.logs.debug("Wikidata query: %s" % query_url)
+        self.logs.debug("Wikidata query: %s", query_url)
 
         response = get(query_url)
         try:
             response_json = response.json()
         except ValueError:
-            self.logs.error("Failed to decode JSON response: %s" % response)
+            self.logs.error("Failed to decode JSON response: %s", response)
             return None
-        self.logs.debug("Wikidata response: %s" % response_json)
+        self.logs.debug("Wikidata response: %s", response_json)
 
         try:
             results = response_json["results"]
             bindings = results["bindings"]
         except KeyError:
-            self.logs.error("Malformed Wikidata response: %s" % response_json)
+            self.logs.error("Malformed Wikidata response: %s", response_json)
             return None
 
         return bindings
@@ -247,6 +478,30 @@ class Analysis:
             entity.salience,
             mentions)
 
+    def annotate_text(self, text):
+        """Finds the entities and the sentiment of text with a single request.
+        Returns them as a tuple or None if the sentiment is missing.
+        """
+
+        # Send the request directly, because Document.annotate_text() expects
+        # the syntax results in the response, which we don't need.
+        document = self.gcnl_client.document_from_text(text)
+        response = self.gcnl_client._connection.api_request(
+            method="POST", path="annotateText", data={
+                "document": document._to_dict(),
+                "features": {"extractEntities": True,
+                             "extractDocumentSentiment": True},
+                "encodingType": document.encoding})
+
+        sentiment_info = response.get("documentSentiment")
+        if sentiment_info is None:
+            self.logs.error("No sentiment in response: %s", response)
+            return None
+
+        entities = [Entity.from_api_repr(entity) for entity in
+                    response.get("entities", [])]
+        return entities, Sentiment.from_api_repr(sentiment_info)
+
     def get_sentiment(self, text):
         """Extracts a sentiment score [-1, 1] from text."""
 
@@ -258,7 +513,7 @@ class Analysis:
         sentiment = document.analyze_sentiment()
 
         self.logs.debug(
-            "Sentiment score and magnitude for text: %s %s \"%s\"" %
-            (sentiment.score, sentiment.magnitude, text))
+            "Sentiment score and magnitude for text: %s %s \"%s\"",
+            sentiment.score, sentiment.magnitude, text)
 
         return sentiment.score
@@ -5,13 +5,18 @@ from os import getenv
 from pytest import fixture
 
 from analysis import Analysis
+from analysis import make_company_data_cache
 from analysis import MID_TO_TICKER_QUERY
 from twitter import Twitter
 
 
 @fixture
-def analysis():
-    return Analysis(logs_to_cloud=False)
+def analysis(tmpdir):
+    # Start with empty caches, separate from the ones of the bot.
+    return Analysis(
+        logs_to_cloud=False,
+        company_data_cache_file=str(tmpdir.join("company-data.db")),
+        tweet_analysis_cache_file=str(tmpdir.join("tweet-analysis.db")))
 
 
 def get_tweet(tweet_id):
@@ -144,6 +149,75 @@ def test_get_company_data(analysis):
     assert analysis.get_company_data("") is None
 
 
+def test_company_data_cache(analysis):
+    responses = [None, [], None, []]
+    queries = []
+
+    def make_wikidata_request(query):
+        queries.append(query)
+        return responses.pop(0)
+
+    analysis.make_wikidata_request = make_wikidata_request
+
+    # Retry failed requests, but keep empty results.
+    assert analysis.get_company_data("/m/035nm") is None
+    assert analysis.get_company_data("/m/035nm") is None
+    assert analysis.get_company_data("/m/035nm") is None
+    assert len(queries) == 2
+
+    assert analysis.get_companies_data(["/m/01snr1"]) is None
+    assert analysis.get_companies_data(["/m/01snr1"]) == {"/m/01snr1": None}
+    assert analysis.get_companies_data(["/m/01snr1"]) == {"/m/01snr1": None}
+    assert len(queries) == 4
+
+
+def test_shared_company_data_cache(tmpdir):
+    company_data_cache = make_company_data_cache(
+        str(tmpdir.join("company-data.db")))
+    queries = []
+
+    def make_wikidata_request(query):
+        queries.append(query)
+        return []
+
+    # Look up the company data only once across the instances.
+    analyses = [Analysis(logs_to_cloud=False,
+                         company_data_cache=company_data_cache)
+                for _ in range(2)]
+    for analysis in analyses:
+        analysis.make_wikidata_request = make_wikidata_request
+        assert analysis.get_company_data("/m/035nm") is None
+    assert len(queries) == 1
+    assert analyses[0].company_data_cache is analyses[1].company_data_cache
+
+
+def test_get_companies_data(analysis):
+    # Look up all MIDs with the batch query.
+    assert not len(analysis.company_data_cache)
+    assert analysis.get_companies_data(
+        ["/m/035nm", "/m/01snr1", "/m/017b3j"]) == {
+        "/m/035nm": [{
+            "exchange": "New York Stock Exchange",
+            "name": "General Motors",
+            "ticker": "GM"}],
+        "/m/01snr1": [{
+            "exchange": "New York Stock Exchange",
+            "name": "Bayer",
+            "root": "BlackRock",
+            "ticker": "BLK"}, {
+            "exchange": "New York Stock Exchange",
+            "name": "Bayer",
+            "root": "PNC Financial Services",
+            "ticker": "PNC"}],
+        "/m/017b3j": None}
+    assert analysis.get_companies_data(["/m/0178g", "/m/0178g"]) == {
+        "/m/0178g": [{
+            "exchange": "New York Stock Exchange",
+            "name": "Boeing",
+            "ticker": "BA"}]}
+    assert analysis.get_companies_data([]) == {}
+
+
 def test_entity_tostring(analysis):
     assert analysis.entity_tostring(Entity(
         name="General Motors",
@@ -376,6 +450,79 @@ def test_find_companies(analysis):
     assert analysis.find_companies(None) is None
 
 
+def test_find_companies_annotations(analysis):
+    requests = []
+
+    def api_request(method, path, data):
+        requests.append((method, path, data["features"]))
+        return {
+            "entities": [{
+                "name": "General Motors",
+                "type": "ORGANIZATION",
+                "metadata": {"mid": "/m/035nm"},
+                "salience": 0.5,
+                "mentions": [{"text": {"content": "General Motors"}}]}],
+            "documentSentiment": {"score": 0.4, "magnitude": 0.8},
+            "language": "en"}
+
+    def get_companies_data(mids):
+        return {"/m/035nm": [{
+            "exchange": "New York Stock Exchange",
+            "name": "General Motors",
+            "ticker": "GM"}]}
+
+    # Expect only the entities and the sentiment in the response.
+    analysis.gcnl_client._connection.api_request = api_request
+    analysis.get_companies_data = get_companies_data
+    tweet = {"text": "General Motors is great!",
+             "entities": {"user_mentions": []}}
+    assert analysis.find_companies(tweet) == [{
+        "exchange": "New York Stock Exchange",
+        "name": "General Motors",
+        "sentiment": 0.4,
+        "ticker": "GM"}]
+    assert requests == [("POST", "annotateText", {
+        "extractEntities": True,
+        "extractDocumentSentiment": True})]
+
+
+def test_find_companies_cached(analysis, monkeypatch):
+    tweet = {"id_str": "806134244384899072"}
+    companies = [{
+        "exchange": "New York Stock Exchange",
+        "name": "Boeing",
+        "sentiment": -0.1,
+        "ticker": "BA"}]
+    responses = [companies, companies, None, companies]
+    tweets = []
+
+    def find_companies(tweet):
+        tweets.append(tweet)
+        return responses.pop(0)
+
+    analysis.find_companies = find_companies
+
+    # Analyze the tweet only once.
+    assert analysis.find_companies_cached(tweet) == companies
+    assert analysis.find_companies_cached(tweet) == companies
+    assert len(tweets) == 1
+
+    # Analyze the tweet again after the analysis changed.
+    monkeypatch.setattr("analysis.ANALYSIS_FINGERPRINT", "changed")
+    assert analysis.find_companies_cached(tweet) == companies
+    assert analysis.find_companies_cached(tweet) == companies
+    assert len(tweets) == 2
+
+    # Retry failed analyses.
+    other_tweet = {"id_str": "812061677160202240"}
+    assert analysis.find_companies_cached(other_tweet) is None
+    assert analysis.find_companies_cached(other_tweet) == companies
+    assert analysis.find_companies_cached(other_tweet) == companies
+    assert len(tweets) == 4
+
+    assert analysis.find_companies_cached(None) is None
+
+
 def test_get_expanded_text(analysis):
     assert analysis.get_expanded_text(get_tweet("829410107406614534")) == (
         u"Thank you Brian Krzanich, CEO of Intel. A great investment ($7 BILLI"
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+from calendar import timegm
+from numpy import arange
+from numpy import array
+from numpy import bincount
+from numpy import concatenate
+from numpy import cumsum
+from numpy import errstate
+from numpy import float64
+from numpy import int64
+from numpy import isfinite
+from numpy import maximum
+from numpy import nan
+from numpy import nonzero
+from numpy import power
+from numpy import where
+from numpy import zeros
+
+# The numeric codes for the strategy actions.
+ACTIONS = {"hold": 0, "bull": 1, "bear": -1}
+
+
+def get_columns(events):
+    """Converts the events and their strategies into column arrays with one
+    row per strategy. Missing prices are NaN. The ticker column indexes into
+    the returned list of tickers.
+    """
+
+    tickers = []
+    ticker_indices = {}
+    rows = {"event": [], "time": [], "day": [], "ticker": [], "action": [],
+            "price_at": [], "price_eod": []}
+
+    for index, event in enumerate(events):
+        timestamp = event["timestamp"]
+        time = timegm(timestamp.utctimetuple())
+        day = timestamp.date().toordinal()
+
+        for strategy in event["strategies"]:
+            ticker = strategy["ticker"]
+            if ticker not in ticker_indices:
+                ticker_indices[ticker] = len(tickers)
+                tickers.append(ticker)
+
+            rows["event"].append(index)
+            rows["time"].append(time)
+            rows["day"].append(day)
+            rows["ticker"].append(ticker_indices[ticker])
+            rows["action"].append(ACTIONS[strategy["action"]])
+            rows["price_at"].append(strategy["price_at"] or nan)
+            rows["price_eod"].append(strategy["price_eod"] or nan)
+
+    columns = {
+        "event": array(rows["event"], dtype=int64),
+        "time": array(rows["time"], dtype=int64),
+        "day": array(rows["day"], dtype=int64),
+        "ticker": array(rows["ticker"], dtype=int64),
+        "action": array(rows["action"], dtype=int64),
+        "price_at": array(rows["price_at"], dtype=float64),
+        "price_eod": array(rows["price_eod"], dtype=float64)}
+
+    return columns, tickers
+
+
+class Backtest:
+    """Simulates a fund trading on the strategies of historical events."""
+
+    def __init__(self, fund_dollars, trade_fee, cash_hold, once_per_day=True):
+        self.fund_dollars = fund_dollars
+        self.trade_fee = trade_fee
+        self.cash_hold = cash_hold
+        self.once_per_day = once_per_day
+
+    def get_trades(self, columns, trade_day=None):
+        """Determines which rows are traded, continuing after a trade on the
+        specified day.
+        """
+
+        # The strategy needs to be active and we need to know the prices.
+        actionable = ((columns["action"] != 0) &
+                      isfinite(columns["price_at"]) &
+                      isfinite(columns["price_eod"]))
+
+        if not self.once_per_day or not len(actionable):
+            return actionable
+
+        # We invest the whole value, so we can only trade once a day. An event
+        # blocks the later ones of the same day if its last strategy trades.
+        events = columns["event"]
+        new_events = concatenate([[True], events[1:] != events[:-1]])
+        last_rows = concatenate([nonzero(new_events)[0][1:] - 1,
+                                 [len(events) - 1]])
+        event_days = columns["day"][last_rows]
+        blocking = actionable[last_rows].astype(int64)
+
+        # Count the blocking events before each event on the same day.
+        blocked_before = cumsum(blocking) - blocking
+        new_days = concatenate([[True], event_days[1:] != event_days[:-1]])
+        day_indices = cumsum(new_days) - 1
+        blocked = blocked_before > blocked_before[new_days][day_indices]
+        if trade_day is not None:
+            blocked |= event_days == trade_day
+
+        # Map the events back to their rows.
+        row_events = cumsum(new_events) - 1
+        return actionable & ~blocked[row_events]
+
+    def run(self, columns, start_time, state=None):
+        """Runs the simulation from the start time in UTC epoch seconds and
+        returns the columns of results per row: whether it trades, the
+        quantity, the fund value after the row, and the total and annualized
+        return ratios. The annualized ratio is NaN for rows at the start time.
+        The results also include the state to continue the simulation with
+        later rows, starting from the given state if there is one.
+        """
+
+        if not state:
+            state = {"value": self.fund_dollars, "trade_day": None}
+
+        num_rows = len(columns["event"])
+        trades = self.get_trades(columns, trade_day=state["trade_day"])
+        quantities = zeros(num_rows, dtype=int64)
+        trade_values = zeros(num_rows, dtype=float64)
+
+        # The budget depends on the value after all previous trades, so only
+        # the events with trades are simulated in order.
+        events = columns["event"]
+        num_trades = bincount(events[trades])
+        trade_rows = nonzero(trades)[0]
+        prices_at = columns["price_at"]
+        prices_eod = columns["price_eod"]
+        actions = columns["action"]
+        value = state["value"]
+        budget = 0.0
+        previous_event = None
+        for row in trade_rows:
+            event = events[row]
+            if event != previous_event:
+                budget = round(max(0.0, value - self.cash_hold) /
+                               int(num_trades[event]), 2)
+                previous_event = event
+
+            # Use the price at tweet to determine stock quantity.
+            price_at = float(prices_at[row])
+            price_eod = float(prices_eod[row])
+            quantity = int(budget // price_at)
+
+            # Pay the fees for both trades and calculate the returns.
+            value -= 2 * self.trade_fee
+            if actions[row] > 0:
+                value -= quantity * price_at  # Buy
+                value += quantity * price_eod  # Sell
+            else:
+                value += quantity * price_at  # Short
+                value -= quantity * price_eod  # Cover
+
+            quantities[row] = quantity
+            trade_values[row] = value
+
+        # The value stays the same until the next trade.
+        last_trades = maximum.accumulate(where(trades, arange(num_rows), -1))
+        values = where(last_trades >= 0, trade_values[last_trades],
+                       state["value"])
+
+        total_ratios = values / self.fund_dollars
+        times = columns["time"]
+        days = (times - start_time) // 86400
+        with errstate(divide="ignore", over="ignore", invalid="ignore"):
+            annualized_ratios = where(
+                days > 0, power(total_ratios, 365.0 / days), 1.0)
+        annualized_ratios[times == start_time] = nan
+
+        # Remember the last day where the last strategy of an event traded.
+        trade_day = state["trade_day"]
+        if num_rows:
+            last_rows = concatenate([nonzero(events[1:] != events[:-1])[0],
+                                     [num_rows - 1]])
+            trade_days = columns["day"][last_rows][trades[last_rows]]
+            if len(trade_days):
+                trade_day = int(trade_days[-1])
+
+        return {"trade": trades, "quantity": quantities, "value": values,
+                "total_ratio": total_ratios,
+                "annualized_ratio": annualized_ratios,
+                "state": {"value": value, "trade_day": trade_day}}
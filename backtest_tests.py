@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+from calendar import timegm
+from datetime import datetime
+from math import isnan
+from pytest import fixture
+from pytz import timezone
+
+from backtest import Backtest
+from backtest import get_columns
+
+# The timezone of the event timestamps.
+MARKET_TIMEZONE = timezone("US/Eastern")
+
+
+def as_market_time(year, month, day, hour=0, minute=0, second=0):
+    market_time = datetime(year, month, day, hour, minute, second)
+    return MARKET_TIMEZONE.localize(market_time)
+
+
+def get_strategy(ticker, action, price_at, price_eod):
+    return {"ticker": ticker, "action": action, "price_at": price_at,
+            "price_eod": price_eod}
+
+
+@fixture
+def events():
+    return [{
+        "timestamp": as_market_time(2017, 1, 3, 9),
+        "strategies": []
+    }, {
+        "timestamp": as_market_time(2017, 1, 3, 10),
+        "strategies": [get_strategy("GM", "bear", 37.0, 36.0),
+                       get_strategy("F", "hold", 12.0, 12.5),
+                       get_strategy("TM", "bull", 120.0, None)]
+    }, {
+        "timestamp": as_market_time(2017, 1, 4, 10),
+        "strategies": [get_strategy("F", "bull", 12.5, 13.0),
+                       get_strategy("GM", "bull", 36.0, 36.5)]
+    }, {
+        "timestamp": as_market_time(2017, 1, 4, 11),
+        "strategies": [get_strategy("F", "bull", 13.0, 13.0)]
+    }, {
+        "timestamp": as_market_time(2017, 1, 5, 10),
+        "strategies": [get_strategy("F", "bear", 13.0, 12.0)]
+    }]
+
+
+def test_get_columns(events):
+    columns, tickers = get_columns(events)
+    assert tickers == ["GM", "F", "TM"]
+    assert list(columns["event"]) == [1, 1, 1, 2, 2, 3, 4]
+    assert list(columns["ticker"]) == [0, 1, 2, 1, 0, 1, 1]
+    assert list(columns["action"]) == [-1, 0, 1, 1, 1, 1, -1]
+    assert columns["time"][0] == 1483455600
+    assert columns["day"][0] == datetime(2017, 1, 3).toordinal()
+    assert isnan(columns["price_eod"][2])
+
+
+def test_get_trades(events):
+    columns, _ = get_columns(events)
+    backtest = Backtest(fund_dollars=100000, trade_fee=4.95, cash_hold=1000)
+    assert list(backtest.get_trades(columns)) == [
+        True, False, False, True, True, False, True]
+    backtest = Backtest(fund_dollars=100000, trade_fee=4.95, cash_hold=1000,
+                        once_per_day=False)
+    assert list(backtest.get_trades(columns)) == [
+        True, False, False, True, True, True, True]
+
+
+def test_run(events):
+    columns, _ = get_columns(events)
+    backtest = Backtest(fund_dollars=100000, trade_fee=4.95, cash_hold=1000)
+    start_time = timegm(events[0]["timestamp"].utctimetuple())
+    results = backtest.run(columns, start_time)
+    assert list(results["quantity"]) == [2675, 0, 0, 4066, 1412, 0, 8029]
+    assert [round(value, 2) for value in results["value"]] == [
+        102665.1, 102665.1, 102665.1, 104688.2, 105384.3, 105384.3, 113403.4]
+    assert round(results["total_ratio"][6], 6) == 1.134034
+    assert results["annualized_ratio"][0] == 1.0
+    assert results["annualized_ratio"][3] == pow(
+        results["total_ratio"][3], 365.0)
+    assert results["annualized_ratio"][6] == pow(
+        results["total_ratio"][6], 365.0 / 2)
+
+
+def test_run_state(events):
+    columns, _ = get_columns(events)
+    backtest = Backtest(fund_dollars=100000, trade_fee=4.95, cash_hold=1000)
+    start_time = timegm(events[0]["timestamp"].utctimetuple())
+    results = backtest.run(columns, start_time)
+    assert results["state"]["trade_day"] == datetime(2017, 1, 5).toordinal()
+
+    # Continue after each event with the state of the previous ones.
+    for split in [0, 3, 5, 6, 7]:
+        first_columns = dict([(name, column[:split]) for name, column in
+                              columns.iteritems()])
+        last_columns = dict([(name, column[split:]) for name, column in
+                             columns.iteritems()])
+        first_results = backtest.run(first_columns, start_time)
+        last_results = backtest.run(last_columns, start_time,
+                                    state=first_results["state"])
+        assert last_results["state"] == results["state"]
+        assert list(last_results["trade"]) == list(results["trade"][split:])
+        assert list(last_results["value"]) == list(results["value"][split:])
@@ -1,10 +1,24 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+from argparse import ArgumentParser
+from calendar import timegm
 from datetime import datetime
+from hashlib import sha1
+from math import isnan
+from multiprocessing import Pool
+from os import path
+from os import rename
+from simplejson import dumps
+from simplejson import loads
 
 from analysis import Analysis
+from analysis import ANALYSIS_FINGERPRINT
+from backtest import Backtest
+from backtest import get_columns
+from trading import CASH_HOLD
 from trading import Trading
+from tweet_archive import TweetArchive
 from twitter import Twitter
 
 # TODO: Consider going back further, e.g. 621669173534584833.
@@ -17,6 +31,27 @@ FUND_DOLLARS = 100000
 # The fee in dollars per trade (https://www.tradeking.com/rates).
 TRADE_FEE = 4.95
 
+# The sentiment thresholds to try in a parameter sweep.
+SWEEP_SENTIMENT_THRESHOLDS = [0, 0.1, 0.2, 0.3]
+
+# The amounts of cash in dollars to hold to try in a parameter sweep.
+SWEEP_CASH_HOLDS = [0, 1000, 10000]
+
+# The fees in dollars per trade to try in a parameter sweep.
+SWEEP_TRADE_FEES = [0, 4.95, 9.95]
+
+# Whether to trade once per day or on every tweet in a parameter sweep.
+SWEEP_ONCE_PER_DAY = [True, False]
+
+# The file keeping the rendered report and the fund state for incremental
+# runs.
+REPORT_STATE_FILE = "/tmp/trump2cash-benchmark-report.json"
+
+# The sources of the modules which the report depends on besides the
+# analysis.
+REPORT_SOURCES = ["backtest.py", "benchmark.py", "market_time.py",
+                  "trading.py", "trading_calendar.py"]
+
 
 def format_ratio(ratio):
     """Converts a ratio to a readable percentage gain."""
@@ -77,7 +112,10 @@ def get_market_status(timestamp):
     # and NASDAQ and include TradeKing's extended hours.
     pre_time = timestamp.replace(hour=8)
     open_time = timestamp.replace(hour=9, minute=30)
-    close_time = timestamp.replace(hour=16)
+    if trading.is_early_close(timestamp):
+        close_time = timestamp.replace(hour=13)
+    else:
+        close_time = timestamp.replace(hour=16)
     after_time = timestamp.replace(hour=17)
 
     # Return the market status for each bucket.
@@ -91,226 +129,537 @@ def get_market_status(timestamp):
         return "closed"
 
 
-# TODO: Refactor trading so this logic can live there.
-def should_trade(strategy, date, previous_trade_date):
-    """Determines whether a trade is happening for the strategy."""
+def init_worker():
+    """Creates the helpers for an event worker process, since the clients of
+    the parent process can't be shared.
+    """
 
-    # We invest the whole value, so we can only trade once a day.
-    if (previous_trade_date and
-        previous_trade_date.replace(hour=0, minute=0, second=0) ==
-            date.replace(hour=0, minute=0, second=0)):
-        return False
+    global analysis
+    global trading
+    global twitter
+    analysis = Analysis(logs_to_cloud=False)
+    trading = Trading(logs_to_cloud=False)
+    twitter = Twitter(logs_to_cloud=False)
 
-    # The strategy needs to be active.
-    if strategy["action"] == "hold":
-        return False
 
-    # We need to know the stock price.
-    if not strategy["price_at"] or not strategy["price_eod"]:
-        return False
+def get_event(tweet):
+    """Analyzes a tweet and looks up the historical prices for the
+    strategies.
+    """
+
+    event = {}
+
+    timestamp_str = tweet["created_at"]
+    timestamp = trading.utc_to_market_time(datetime.strptime(
+        timestamp_str, "%a %b %d %H:%M:%S +0000 %Y"))
+    text = tweet["text"]
+    event["id"] = tweet["id_str"]
+    event["timestamp"] = timestamp
+    event["text"] = text
+    event["link"] = twitter.get_tweet_link(tweet)
+
+    # Extract the companies, reusing the results from previous runs. Skip
+    # them if the analysis failed, but remember to retry it.
+    companies = analysis.find_companies_cached(tweet)
+    event["failed"] = companies is None
+    if companies is None:
+        companies = []
+
+    # Keep the market status to reevaluate the strategies in sweeps.
+    market_status = get_market_status(timestamp)
+    event["market_status"] = market_status
+
+    strategies = []
+    for company in companies:
+
+        # What would have been the strategy?
+        strategy = trading.get_strategy(company, market_status)
+
+        # What was the price at tweet and at EOD?
+        price = trading.get_historical_prices(
+            company["ticker"], timestamp)
+        if price:
+            strategy["price_at"] = price["at"]
+            strategy["price_eod"] = price["eod"]
+        else:
+            strategy["price_at"] = None
+            strategy["price_eod"] = None
 
-    return True
+        strategies.append(strategy)
 
+    event["strategies"] = strategies
 
-if __name__ == "__main__":
-    analysis = Analysis(logs_to_cloud=False)
-    trading = Trading(logs_to_cloud=False)
-    twitter = Twitter(logs_to_cloud=False)
+    return event
 
-    # Look up the metadata for the tweets.
-    tweets = twitter.get_tweets(SINCE_TWEET_ID)
 
-    events = []
-    for tweet in tweets:
-        event = {}
+def get_events(tweets, workers=1):
+    """Analyzes the tweets and looks up the historical prices for the
+    strategies, spread across the specified number of worker processes.
+    """
 
-        timestamp_str = tweet["created_at"]
-        timestamp = trading.utc_to_market_time(datetime.strptime(
-            timestamp_str, "%a %b %d %H:%M:%S +0000 %Y"))
-        text = tweet["text"]
-        event["timestamp"] = timestamp
-        event["text"] = text
-        event["link"] = twitter.get_tweet_link(tweet)
+    if workers > 1:
+        # Convert the market data up front, so the workers don't convert the
+        # same files at the same time.
+        trading.ingest_market_data()
 
-        # Extract the companies.
-        companies = analysis.find_companies(tweet)
+        pool = Pool(processes=workers, initializer=init_worker)
+        try:
+            events = pool.map(get_event, tweets, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        events = map(get_event, tweets)
+
+    # Make sure the events are ordered by ascending timestatmp. The results
+    # are in the order of the tweets, so this matches a sequential run.
+    return sorted(events, key=lambda event: event["timestamp"])
+
+
+def get_report_fingerprint():
+    """Hashes the analysis version and the sources of the modules which
+    render the report and simulate the fund, so that a report from an older
+    version isn't continued.
+    """
+
+    fingerprint = sha1(ANALYSIS_FINGERPRINT)
+    for source in REPORT_SOURCES:
+        source_file = open(path.join(path.dirname(__file__), source), "rb")
+        try:
+            fingerprint.update(source_file.read())
+        finally:
+            source_file.close()
+
+    return fingerprint.hexdigest()
+
+
+# The fingerprint of the current version of the report.
+REPORT_FINGERPRINT = get_report_fingerprint()
+
+
+def get_header_lines():
+    """Renders the beginning of the report as markdown lines."""
+
+    return [
+        "## Benchmark Report",
+        "",
+        ("This breakdown of the analysis results and market performance vali"
+         "dates the current implementation against historical data."),
+        "",
+        ("Use this command to regenerate the benchmark report after changes "
+         "to the algorithm or data:"),
+        "```shell",
+        "$ ./benchmark.py > benchmark.md",
+        "```",
+        "",
+        "### Events overview",
+        "",
+        ("Here's each tweet with the results of its analysis and individual "
+         "market performance.")]
+
+
+def get_event_lines(event):
+    """Renders the overview of an event as markdown lines."""
+
+    strategies = event["strategies"]
+    if not strategies:
+        return []
+
+    timestamp = format_timestamp(event["timestamp"], weekday=True)
+    event_lines = ["", "##### [%s](%s)" % (timestamp, event["link"]), ""]
+    lines = ["> %s" % line for line in event["text"].split("\n")]
+    event_lines.append("\n\n".join(lines))
+    event_lines.extend([
+        "",
+        "*Strategy*",
+        "",
+        "Company | Root | Sentiment | Strategy | Reason",
+        "--------|------|-----------|----------|-------"])
+
+    for strategy in strategies:
+        root = "-" if "root" not in strategy else strategy["root"]
+        sentiment = strategy["sentiment"]
+        sentiment_emoji = get_sentiment_emoji(sentiment)
+        event_lines.append("%s | %s | %s %s | %s | %s" % (
+            strategy["name"],
+            root,
+            sentiment,
+            sentiment_emoji,
+            strategy["action"],
+            strategy["reason"]))
+
+    event_lines.extend([
+        "",
+        "*Performance*",
+        "",
+        "Ticker | Exchange | Price @ tweet | Price @ close | Gain",
+        "-------|----------|---------------|---------------|-----"])
+
+    for strategy in strategies:
+        price_at = strategy["price_at"]
+        price_eod = strategy["price_eod"]
+        if price_at and price_eod:
+            price_at_str = format_dollar(price_at)
+            price_eod_str = format_dollar(price_eod)
+        else:
+            price_at_str = "-"
+            price_eod_str = "-"
+        ratio = get_ratio(strategy)
+        gain = format_ratio(ratio)
+        event_lines.append("%s | %s | %s | %s | %s" % (
+            strategy["ticker"],
+            strategy["exchange"],
+            price_at_str,
+            price_eod_str,
+            gain))
+
+    return event_lines
+
+
+def get_fund_header_lines():
+    """Renders the beginning of the fund simulation as markdown lines."""
+
+    return [
+        "",
+        "### Fund simulation",
+        "",
+        (u"This is how an initial investment of %s would have grown, includi"
+         u"ng fees of 2 \u00d7 %s per pair of orders. Bold means that the da"
+         u"ta was used to trade.") % (
+             format_dollar(FUND_DOLLARS), format_dollar(TRADE_FEE)),
+        "",
+        "Time | Trade | Gain | Value | Return | Annualized",
+        "-----|-------|------|-------|--------|-----------",
+        "*Initial* | - | - | *%s* | - | -" % format_dollar(FUND_DOLLARS)]
+
+
+def get_fund_line(date, strategy, results, row):
+    """Renders the fund simulation results for a strategy as a markdown line.
+    """
+
+    trade = results["trade"][row]
+    value = results["value"][row]
+    total_return = format_ratio(results["total_ratio"][row])
+
+    annualized_ratio = results["annualized_ratio"][row]
+    if isnan(annualized_ratio):
+        annualized_return = "-"
+    else:
+        annualized_return = format_ratio(annualized_ratio)
+
+    date_str = format_timestamp(date)
+    trade_str = u"%s %s" % (
+        strategy["ticker"],
+        get_sentiment_emoji(strategy["sentiment"]))
+    ratio = get_ratio(strategy)
+    gain = format_ratio(ratio)
+
+    if trade:
+        date_str = "**%s**" % date_str
+        trade_str = "**%s**" % trade_str
+
+    return "%s | %s | %s | %s | %s | %s" % (
+        date_str,
+        trade_str,
+        gain,
+        format_dollar(value),
+        total_return,
+        annualized_return)
+
+
+def make_report(events, report=None):
+    """Renders the sections of the report for the events and simulates the
+    fund for them, continuing the given report if there is one. The sections
+    and the fund state are kept per tweet ID. The report also remembers where
+    to continue before the first event with a failed analysis, so that it can
+    be retried.
+    """
+
+    if not report:
+        report = {
+            "fingerprint": REPORT_FINGERPRINT,
+            "start_time": timegm(events[0]["timestamp"].utctimetuple()),
+            "fund": None,
+            "sections": [],
+            "resume": {"sections": 0, "fund": None}}
+
+    # Simulate the fund over all strategies at once.
+    columns, _ = get_columns(events)
+    backtest = Backtest(fund_dollars=FUND_DOLLARS, trade_fee=TRADE_FEE,
+                        cash_hold=CASH_HOLD)
+    results = backtest.run(columns, report["start_time"],
+                           state=report["fund"])
+
+    # Continue next time before the first failed analysis, unless there was
+    # an earlier one.
+    if report["resume"]["sections"] == len(report["sections"]):
+        failed = [index for index, event in enumerate(events) if
+                  event["failed"]]
+        if failed:
+            resume_columns, _ = get_columns(events[:failed[0]])
+            resume_fund = backtest.run(resume_columns, report["start_time"],
+                                       state=report["fund"])["state"]
+            report["resume"] = {
+                "sections": len(report["sections"]) + failed[0],
+                "fund": resume_fund}
+        else:
+            report["resume"] = {
+                "sections": len(report["sections"]) + len(events),
+                "fund": results["state"]}
 
-        strategies = []
-        for company in companies:
+    row = 0
+    for event in events:
+        fund_lines = []
+        for strategy in event["strategies"]:
+            fund_lines.append(get_fund_line(event["timestamp"], strategy,
+                                            results, row))
+            row += 1
 
-            # What would have been the strategy?
-            market_status = get_market_status(timestamp)
-            strategy = trading.get_strategy(company, market_status)
+        report["sections"].append({
+            "id": event["id"],
+            "time": timegm(event["timestamp"].utctimetuple()),
+            "event_lines": get_event_lines(event),
+            "fund_lines": fund_lines})
 
-            # What was the price at tweet and at EOD?
-            price = trading.get_historical_prices(
-                company["ticker"], timestamp)
-            if price:
-                strategy["price_at"] = price["at"]
-                strategy["price_eod"] = price["eod"]
-            else:
-                strategy["price_at"] = None
-                strategy["price_eod"] = None
+    report["fund"] = results["state"]
+    return report
 
-            strategies.append(strategy)
 
-        event["strategies"] = strategies
+def load_report():
+    """Reads the report state from the last run or returns None if there is
+    no usable one. The report is cut back before the first failed analysis,
+    so that it is retried.
+    """
 
-        events.append(event)
+    try:
+        report_file = open(REPORT_STATE_FILE, "r")
+    except IOError:
+        return None
 
-    # Make sure the events are ordered by ascending timestatmp.
-    events = sorted(events, key=lambda event: event["timestamp"])
+    try:
+        report = loads(report_file.read())
+    except ValueError:
+        return None
+    finally:
+        report_file.close()
 
-    # Print out the formatted benchmark results as markdown.
-    print "## Benchmark Report"
-    print
-    print ("This breakdown of the analysis results and market performance vali"
-           "dates the current implementation against historical data.")
-    print
-    print ("Use this command to regenerate the benchmark report after changes "
-           "to the algorithm or data:")
-    print "```shell"
-    print "$ ./benchmark.py > benchmark.md"
-    print "```"
+    # Start over if anything affecting the report has changed.
+    if report.get("fingerprint") != REPORT_FINGERPRINT:
+        return None
+
+    # Continue before the first failed analysis to retry it.
+    resume = report["resume"]
+    report["sections"] = report["sections"][:resume["sections"]]
+    report["fund"] = resume["fund"]
+    if not report["sections"]:
+        return None
+
+    return report
+
+
+def save_report(report):
+    """Writes the report state for the next incremental run."""
+
+    # Write to a temporary file first so a failed run can't leave a partial
+    # state behind.
+    temp_filename = "%s.tmp" % REPORT_STATE_FILE
+    report_file = open(temp_filename, "w")
+    try:
+        report_file.write(dumps(report))
+    finally:
+        report_file.close()
+    rename(temp_filename, REPORT_STATE_FILE)
 
-    print
-    print "### Events overview"
-    print
-    print ("Here's each tweet with the results of its analysis and individual "
-           "market performance.")
 
+def update_report(tweets, workers=1):
+    """Continues the report from the last run with the new tweets or
+    returns None if it can't be continued.
+    """
+
+    report = load_report()
+    if not report:
+        return None
+
+    last_id = max([int(section["id"]) for section in report["sections"]])
+    new_tweets = [tweet for tweet in tweets if int(tweet["id_str"]) > last_id]
+    if not new_tweets:
+        return report
+
+    # The fund simulation can only continue with later events.
+    events = get_events(new_tweets, workers=workers)
+    if (timegm(events[0]["timestamp"].utctimetuple()) <
+            report["sections"][-1]["time"]):
+        return None
+
+    return make_report(events, report)
+
+
+def print_report(report):
+    """Prints out the formatted benchmark results as markdown."""
+
+    lines = get_header_lines()
+    for section in report["sections"]:
+        lines.extend(section["event_lines"])
+    lines.extend(get_fund_header_lines())
+    for section in report["sections"]:
+        lines.extend(section["fund_lines"])
+
+    print "\n".join(lines)
+
+
+def get_sweep_events(events, sentiment_threshold):
+    """Reevaluates the strategies of the events for a sentiment threshold."""
+
+    sweep_events = []
     for event in events:
-        strategies = event["strategies"]
-
-        if strategies:
-            timestamp = format_timestamp(event["timestamp"], weekday=True)
-            print
-            print "##### [%s](%s)" % (timestamp, event["link"])
-            print
-            lines = ["> %s" % line for line in event["text"].split("\n")]
-            print "\n\n".join(lines)
-            print
-            print "*Strategy*"
-            print
-            print "Company | Root | Sentiment | Strategy | Reason"
-            print "--------|------|-----------|----------|-------"
-
-            for strategy in strategies:
-                root = "-" if "root" not in strategy else strategy["root"]
-                sentiment = strategy["sentiment"]
-                sentiment_emoji = get_sentiment_emoji(sentiment)
-                print "%s | %s | %s %s | %s | %s" % (
-                    strategy["name"],
-                    root,
-                    sentiment,
-                    sentiment_emoji,
-                    strategy["action"],
-                    strategy["reason"])
-
-            print
-            print "*Performance*"
-            print
-            print "Ticker | Exchange | Price @ tweet | Price @ close | Gain"
-            print "-------|----------|---------------|---------------|-----"
-
-            for strategy in strategies:
-                price_at = strategy["price_at"]
-                price_eod = strategy["price_eod"]
-                if price_at and price_eod:
-                    price_at_str = format_dollar(price_at)
-                    price_eod_str = format_dollar(price_eod)
-                else:
-                    price_at_str = "-"
-                    price_eod_str = "-"
-                ratio = get_ratio(strategy)
-                gain = format_ratio(ratio)
-                print "%s | %s | %s | %s | %s" % (
-                    strategy["ticker"],
-                    strategy["exchange"],
-                    price_at_str,
-                    price_eod_str,
-                    gain)
+        strategies = []
+        for strategy in event["strategies"]:
+            sweep_strategy = trading.get_strategy(
+                strategy, event["market_status"],
+                sentiment_threshold=sentiment_threshold)
+            sweep_strategy["price_at"] = strategy["price_at"]
+            sweep_strategy["price_eod"] = strategy["price_eod"]
+            strategies.append(sweep_strategy)
+        sweep_events.append({"timestamp": event["timestamp"],
+                             "strategies": strategies})
+
+    return sweep_events
+
+
+def run_sweep_backtest(params):
+    """Simulates the fund for one combination of sweep parameters and
+    summarizes the final results.
+    """
+
+    columns = params["columns"]
+    backtest = Backtest(fund_dollars=FUND_DOLLARS,
+                        trade_fee=params["trade_fee"],
+                        cash_hold=params["cash_hold"],
+                        once_per_day=params["once_per_day"])
+    results = backtest.run(columns, params["start_time"])
+
+    summary = dict([(key, value) for key, value in params.iteritems() if
+                    key != "columns"])
+    summary["trades"] = int(results["trade"].sum())
+    if len(columns["event"]):
+        summary["value"] = float(results["value"][-1])
+        summary["total_ratio"] = float(results["total_ratio"][-1])
+        summary["annualized_ratio"] = float(results["annualized_ratio"][-1])
+    else:
+        summary["value"] = float(FUND_DOLLARS)
+        summary["total_ratio"] = 1.0
+        summary["annualized_ratio"] = float("nan")
+
+    return summary
+
+
+def print_sweep(events, workers=1):
+    """Simulates the fund for all combinations of the sweep parameters,
+    spread across the specified number of worker processes, and prints out
+    the results as markdown, ranked by return.
+    """
+
+    start_time = timegm(events[0]["timestamp"].utctimetuple())
+
+    # The strategies only depend on the sentiment threshold, so reevaluate
+    # them once per threshold.
+    sweep_params = []
+    for sentiment_threshold in SWEEP_SENTIMENT_THRESHOLDS:
+        columns, _ = get_columns(get_sweep_events(events, sentiment_threshold))
+        for cash_hold in SWEEP_CASH_HOLDS:
+            for trade_fee in SWEEP_TRADE_FEES:
+                for once_per_day in SWEEP_ONCE_PER_DAY:
+                    sweep_params.append({
+                        "columns": columns,
+                        "start_time": start_time,
+                        "sentiment_threshold": sentiment_threshold,
+                        "cash_hold": cash_hold,
+                        "trade_fee": trade_fee,
+                        "once_per_day": once_per_day})
+
+    if workers > 1:
+        pool = Pool(processes=workers)
+        try:
+            summaries = pool.map(run_sweep_backtest, sweep_params)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        summaries = map(run_sweep_backtest, sweep_params)
 
+    summaries = sorted(summaries, key=lambda summary: summary["value"],
+                       reverse=True)
+
+    print "## Parameter Sweep"
     print
-    print "### Fund simulation"
-    print
-    print (u"This is how an initial investment of %s would have grown, includi"
-           u"ng fees of 2 \u00d7 %s per pair of orders. Bold means that the da"
-           u"ta was used to trade.") % (
-               format_dollar(FUND_DOLLARS), format_dollar(TRADE_FEE))
+    print ("This is how an initial investment of %s would have grown with each"
+           " combination of parameters, best first.") % (
+               format_dollar(FUND_DOLLARS))
     print
-    print "Time | Trade | Gain | Value | Return | Annualized"
-    print "-----|-------|------|-------|--------|-----------"
-    start_date = events[0]["timestamp"]
-    value = FUND_DOLLARS
-    print "*Initial* | - | - | *%s* | - | -" % format_dollar(value)
+    print ("Rank | Sentiment threshold | Cash hold | Trade fee | Trading | Tra"
+           "des | Value | Return | Annualized")
+    print ("-----|---------------------|-----------|-----------|---------|----"
+           "----|-------|--------|-----------")
+
+    for rank, summary in enumerate(summaries):
+        if summary["once_per_day"]:
+            trading_str = "once per day"
+        else:
+            trading_str = "per tweet"
 
-    previous_trade_date = None
-    for event in events:
-        date = event["timestamp"]
-        strategies = event["strategies"]
-
-        # Figure out what to spend on each trade.
-        num_actionable_strategies = sum(
-            [1 for strategy in strategies if should_trade(
-                strategy, date, previous_trade_date)])
-        budget = trading.get_budget(value, num_actionable_strategies)
-
-        trade = False
-        for strategy in strategies:
-            trade = should_trade(strategy, date, previous_trade_date)
-
-            price_at = strategy["price_at"]
-            price_eod = strategy["price_eod"]
-
-            if trade:
-                # Use the price at tweet to determine stock quantity.
-                quantity = int(budget // price_at)
-
-                # Pay the fees for both trades.
-                value -= 2 * TRADE_FEE
-
-                # Calculate the returns depending on the strategy.
-                if strategy["action"] == "bull":
-                    value -= quantity * price_at  # Buy
-                    value += quantity * price_eod  # Sell
-                elif strategy["action"] == "bear":
-                    value += quantity * price_at  # Short
-                    value -= quantity * price_eod  # Cover
-            else:
-                quantity = 0
-
-            total_ratio = value / FUND_DOLLARS
-            total_return = format_ratio(total_ratio)
-
-            if date != start_date:
-                days = (date - start_date).days
-                if days > 0:
-                    annualized_ratio = pow(total_ratio, 365.0 / days)
-                else:
-                    annualized_ratio = 1
-                annualized_return = format_ratio(annualized_ratio)
-            else:
-                annualized_return = "-"
-
-            date_str = format_timestamp(date)
-            trade_str = u"%s %s" % (
-                strategy["ticker"],
-                get_sentiment_emoji(strategy["sentiment"]))
-            ratio = get_ratio(strategy)
-            gain = format_ratio(ratio)
-
-            if trade:
-                date_str = "**%s**" % date_str
-                trade_str = "**%s**" % trade_str
-
-            print "%s | %s | %s | %s | %s | %s" % (
-                date_str,
-                trade_str,
-                gain,
-                format_dollar(value),
-                total_return,
-                annualized_return)
-
-        if trade:
-            previous_trade_date = date
+        if isnan(summary["annualized_ratio"]):
+            annualized_return = "-"
+        else:
+            annualized_return = format_ratio(summary["annualized_ratio"])
+
+        print "%s | %s | %s | %s | %s | %s | %s | %s | %s" % (
+            rank + 1,
+            summary["sentiment_threshold"],
+            format_dollar(summary["cash_hold"]),
+            format_dollar(summary["trade_fee"]),
+            trading_str,
+            summary["trades"],
+            format_dollar(summary["value"]),
+            format_ratio(summary["total_ratio"]),
+            annualized_return)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Benchmarks the analysis and trading"
+                            " against historical tweets and market data.")
+    parser.add_argument("--sweep", action="store_true",
+                        help="rank combinations of the trading parameters"
+                        " instead of printing the report")
+    parser.add_argument("--offline", action="store_true",
+                        help="only use the tweets in the local archive"
+                        " without syncing it first")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only add the new tweets to the report from the"
+                        " last run, if possible")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="the number of processes analyzing tweets and"
+                        " running the sweep")
+    args = parser.parse_args()
+
+    analysis = Analysis(logs_to_cloud=False)
+    trading = Trading(logs_to_cloud=False)
+    twitter = Twitter(logs_to_cloud=False)
+
+    # Look up the metadata for the tweets, fetching only the ones which
+    # aren't archived yet.
+    tweet_archive = TweetArchive(logs_to_cloud=False)
+    if not args.offline:
+        tweet_archive.sync(twitter, SINCE_TWEET_ID)
+    tweets = tweet_archive.get_tweets(SINCE_TWEET_ID)
+
+    if args.sweep:
+        print_sweep(get_events(tweets, workers=args.workers),
+                    workers=args.workers)
+    else:
+        report = None
+        if args.incremental:
+            report = update_report(tweets, workers=args.workers)
+        if not report:
+            report = make_report(get_events(tweets, workers=args.workers))
+        save_report(report)
+        print_report(report)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+from calendar import timegm
+from datetime import datetime
+from pytest import fixture
+from pytz import timezone
+
+from backtest import Backtest
+from backtest import get_columns
+from benchmark import format_dollar
+from benchmark import FUND_DOLLARS
+from benchmark import get_events
+from benchmark import get_market_status
+from benchmark import get_sweep_events
+from benchmark import load_report
+from benchmark import make_report
+from benchmark import print_sweep
+from benchmark import save_report
+from benchmark import update_report
+from trading import Trading
+
+# The timezone of the event timestamps.
+MARKET_TIMEZONE = timezone("US/Eastern")
+
+
+def as_market_time(year, month, day, hour=0, minute=0, second=0):
+    market_time = datetime(year, month, day, hour, minute, second)
+    return MARKET_TIMEZONE.localize(market_time)
+
+
+def get_strategy(ticker, sentiment, price_at, price_eod):
+    return {"name": ticker, "ticker": ticker, "exchange": "NASDAQ",
+            "sentiment": sentiment, "action": "hold", "reason": "",
+            "price_at": price_at, "price_eod": price_eod}
+
+
+@fixture
+def trading(monkeypatch):
+    trading = Trading(logs_to_cloud=False)
+    monkeypatch.setattr("benchmark.trading", trading, raising=False)
+    return trading
+
+
+@fixture
+def events():
+    return [{
+        "timestamp": as_market_time(2017, 1, 3, 10),
+        "market_status": "open",
+        "strategies": [get_strategy("GM", 0.5, 37.0, 38.0),
+                       get_strategy("F", -0.2, 12.0, 11.5)]
+    }, {
+        "timestamp": as_market_time(2017, 1, 4, 10),
+        "market_status": "open",
+        "strategies": [get_strategy("F", 0.2, 11.5, 12.5)]
+    }, {
+        "timestamp": as_market_time(2017, 1, 4, 20),
+        "market_status": "closed",
+        "strategies": [get_strategy("TM", 0.8, 120.0, 121.0)]
+    }]
+
+
+def test_print_sweep(trading, events, monkeypatch, capsys):
+    monkeypatch.setattr("benchmark.SWEEP_SENTIMENT_THRESHOLDS", [0, 0.3])
+    monkeypatch.setattr("benchmark.SWEEP_CASH_HOLDS", [0])
+    monkeypatch.setattr("benchmark.SWEEP_TRADE_FEES", [0, 4.95])
+    monkeypatch.setattr("benchmark.SWEEP_ONCE_PER_DAY", [False])
+
+    # Simulate each combination directly.
+    start_time = timegm(events[0]["timestamp"].utctimetuple())
+    expected = []
+    for sentiment_threshold in [0, 0.3]:
+        columns, _ = get_columns(get_sweep_events(events, sentiment_threshold))
+        for trade_fee in [0, 4.95]:
+            backtest = Backtest(fund_dollars=FUND_DOLLARS, trade_fee=trade_fee,
+                                cash_hold=0, once_per_day=False)
+            value = backtest.run(columns, start_time)["value"][-1]
+            expected.append((value, str(sentiment_threshold),
+                             format_dollar(trade_fee), format_dollar(value)))
+    expected = [row[1:] for row in sorted(expected, reverse=True)]
+    assert len(set(expected)) == 4
+
+    # Rank the same results in a single process and in several.
+    for workers in [1, 2]:
+        print_sweep(events, workers=workers)
+        lines = capsys.readouterr()[0].splitlines()
+        rows = [line.split(" | ") for line in lines[6:]]
+        assert [row[0] for row in rows] == ["1", "2", "3", "4"]
+        assert [(row[1], row[3], row[6]) for row in rows] == expected
+
+
+def get_report_event(trading, tweet_id, timestamp, companies, failed=False):
+    market_status = get_market_status(timestamp)
+    strategies = []
+    for ticker, sentiment, price_at, price_eod in companies:
+        strategy = trading.get_strategy(
+            {"name": ticker, "ticker": ticker, "exchange": "NASDAQ",
+             "sentiment": sentiment}, market_status)
+        strategy["price_at"] = price_at
+        strategy["price_eod"] = price_eod
+        strategies.append(strategy)
+    return {"id": tweet_id, "timestamp": timestamp, "text": "Tweet",
+            "link": "https://twitter.com/%s" % tweet_id,
+            "market_status": market_status, "strategies": strategies,
+            "failed": failed}
+
+
+@fixture
+def report_events(trading):
+    return [
+        get_report_event(trading, "1", as_market_time(2017, 1, 3, 10),
+                         [("GM", 0.5, 37.0, 38.0)]),
+        get_report_event(trading, "2", as_market_time(2017, 1, 4, 10),
+                         [("F", -0.4, 12.0, 11.5), ("GM", 0.2, 38.0, 37.5)]),
+        get_report_event(trading, "3", as_market_time(2017, 1, 4, 20), []),
+        get_report_event(trading, "4", as_market_time(2017, 1, 5, 10),
+                         [("TM", 0.3, 120.0, 122.0)]),
+        get_report_event(trading, "5", as_market_time(2017, 1, 6, 10),
+                         [("F", 0.6, 11.5, 12.0)]),
+        get_report_event(trading, "6", as_market_time(2017, 1, 9, 9),
+                         [("GM", -0.3, 37.5, None)])]
+
+
+@fixture
+def analyzed(report_events, tmpdir, monkeypatch):
+    monkeypatch.setattr("benchmark.REPORT_STATE_FILE",
+                        str(tmpdir.join("report.json")))
+
+    # Look up the events for the tweets instead of analyzing them.
+    analyzed = {"events": dict([(event["id"], event) for event in
+                                report_events]),
+                "tweet_ids": []}
+
+    def get_events(tweets, workers=1):
+        tweet_ids = [tweet["id_str"] for tweet in tweets]
+        analyzed["tweet_ids"].append(tweet_ids)
+        return [analyzed["events"][tweet_id] for tweet_id in tweet_ids]
+
+    monkeypatch.setattr("benchmark.get_events", get_events)
+    return analyzed
+
+
+def test_update_report(report_events, analyzed):
+    tweets = [{"id_str": event["id"]} for event in report_events]
+    full_report = make_report(report_events)
+
+    # Only analyze the new tweets and continue the fund simulation.
+    save_report(make_report(report_events[:2]))
+    report = update_report(tweets)
+    assert analyzed["tweet_ids"] == [["3", "4", "5", "6"]]
+    assert report["sections"] == full_report["sections"]
+    assert report["fund"]["value"] == full_report["fund"]["value"]
+
+    save_report(report)
+    assert update_report(tweets)["sections"] == full_report["sections"]
+    assert len(analyzed["tweet_ids"]) == 1
+
+
+def test_update_report_fingerprint(report_events, analyzed, monkeypatch):
+    tweets = [{"id_str": event["id"]} for event in report_events]
+    save_report(make_report(report_events[:2]))
+
+    # Start over after the code changed.
+    monkeypatch.setattr("benchmark.REPORT_FINGERPRINT", "changed")
+    assert load_report() is None
+    assert update_report(tweets) is None
+    assert not analyzed["tweet_ids"]
+
+
+def test_update_report_failed(trading, report_events, analyzed):
+    tweets = [{"id_str": event["id"]} for event in report_events]
+    full_report = make_report(report_events)
+
+    # Retry the failed analysis and everything after it.
+    failed_event = get_report_event(
+        trading, "2", as_market_time(2017, 1, 4, 10), [], failed=True)
+    save_report(make_report(report_events[:1] + [failed_event] +
+                            report_events[2:4]))
+    report = update_report(tweets)
+    assert analyzed["tweet_ids"] == [["2", "3", "4", "5", "6"]]
+    assert report["sections"] == full_report["sections"]
+    assert report["fund"]["value"] == full_report["fund"]["value"]
+
+
+class FakeAnalysis:
+    """A stand-in for the analysis which finds companies by tweet ID."""
+
+    def __init__(self, companies):
+        self.companies = companies
+
+    def find_companies_cached(self, tweet):
+        return self.companies[tweet["id_str"]]
+
+
+class FakeTrading(Trading):
+    """A stand-in for trading with made-up historical prices."""
+
+    def ingest_market_data(self):
+        pass
+
+    def get_historical_prices(self, ticker, timestamp):
+        if ticker == "TM":
+            return None
+        return {"at": 10.0 + timestamp.hour, "eod": 11.0 + timestamp.hour}
+
+
+class FakeTwitter:
+    """A stand-in for Twitter which links tweets by ID."""
+
+    def get_tweet_link(self, tweet):
+        return "https://twitter.com/%s" % tweet["id_str"]
+
+
+def test_get_events(monkeypatch):
+    company = {"name": "Ford", "ticker": "F", "exchange": "NASDAQ",
+               "sentiment": 0.5}
+    other_company = {"name": "Toyota", "ticker": "TM", "exchange": "NASDAQ",
+                     "sentiment": -0.5}
+    analysis = FakeAnalysis({"1": [company], "2": [], "3": None,
+                             "4": [company, other_company]})
+    monkeypatch.setattr("benchmark.analysis", analysis, raising=False)
+    monkeypatch.setattr("benchmark.trading", FakeTrading(logs_to_cloud=False),
+                        raising=False)
+    monkeypatch.setattr("benchmark.twitter", FakeTwitter(), raising=False)
+
+    # Keep the stand-ins in the worker processes.
+    monkeypatch.setattr("benchmark.init_worker", lambda: None)
+
+    tweets = [{"id_str": "4", "text": "Four",
+               "created_at": "Thu Jan 05 16:00:00 +0000 2017"},
+              {"id_str": "1", "text": "One",
+               "created_at": "Tue Jan 03 15:00:00 +0000 2017"},
+              {"id_str": "3", "text": "Three",
+               "created_at": "Wed Jan 04 22:00:00 +0000 2017"},
+              {"id_str": "2", "text": "Two",
+               "created_at": "Wed Jan 04 15:00:00 +0000 2017"}]
+
+    # Analyze the tweets the same way in several processes.
+    events = get_events(tweets)
+    assert [event["id"] for event in events] == ["1", "2", "3", "4"]
+    assert [event["failed"] for event in events] == [
+        False, False, True, False]
+    assert get_events(tweets, workers=2) == events
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from simplejson import dumps
+from simplejson import loads
+from sqlite3 import connect
+from threading import RLock
+from time import time
+
+
+class Cache:
+    """A thread-safe LRU cache with expiry, optionally persisted to SQLite.
+    The size can be limited by the number of entries and by the total bytes
+    of the values as measured by the sizeof function.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, filename=None,
+                 table="cache", max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.lock = RLock()
+
+        # Keep the entries as (expiry, value, size) in least recently used
+        # order.
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+        # Count the lookups for monitoring.
+        self.hits = 0
+        self.misses = 0
+
+        if filename:
+            # Share the connection across threads, guarded by the lock.
+            self.db = connect(filename, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS %s"
+                            " (key TEXT PRIMARY KEY, expiry REAL,"
+                            " value TEXT)" % self.table)
+            self.db.commit()
+            self.load()
+        else:
+            self.db = None
+
+    def load(self):
+        """Warms the in-memory entries with the unexpired persisted ones."""
+
+        with self.lock:
+            now = time()
+            self.db.execute("DELETE FROM %s WHERE expiry IS NOT NULL AND"
+                            " expiry <= ?" % self.table, [now])
+            self.db.commit()
+            for key, expiry, value in self.db.execute(
+                    "SELECT key, expiry, value FROM %s" % self.table):
+                self.add(key, expiry, loads(value))
+            self.evict()
+
+    def get(self, key):
+        """Looks up the value for a key and raises a KeyError if it is missing
+        or expired. None is a valid value, e.g. for negative results.
+        """
+
+        with self.lock:
+            try:
+                expiry, value, size = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                raise
+
+            if expiry is not None and expiry <= time():
+                self.bytes -= size
+                self.delete_persisted(key)
+                self.misses += 1
+                raise KeyError(key)
+
+            # Mark the entry as most recently used.
+            self.entries[key] = (expiry, value, size)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores a value for a key, evicting the least recently used entries
+        if the cache is full.
+        """
+
+        with self.lock:
+            if self.ttl is not None:
+                expiry = time() + self.ttl
+            else:
+                expiry = None
+
+            self.add(key, expiry, value)
+
+            if self.db:
+                self.db.execute("INSERT OR REPLACE INTO %s"
+                                " (key, expiry, value) VALUES (?, ?, ?)" %
+                                self.table, [key, expiry, dumps(value)])
+                self.db.commit()
+
+            self.evict()
+
+    def add(self, key, expiry, value):
+        """Adds an entry as the most recently used one."""
+
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[2]
+
+        size = self.sizeof(value) if self.sizeof else 0
+        self.entries[key] = (expiry, value, size)
+        self.bytes += size
+
+    def evict(self):
+        """Drops the least recently used entries beyond the maximum size."""
+
+        with self.lock:
+            while ((self.max_entries is not None and
+                    len(self.entries) > self.max_entries) or
+                   (self.max_bytes is not None and
+                    self.bytes > self.max_bytes)):
+                key, (_, _, size) = self.entries.popitem(last=False)
+                self.bytes -= size
+                self.delete_persisted(key)
+
+    def delete_persisted(self, key):
+        """Removes an entry from the persisted cache, if there is one."""
+
+        if self.db:
+            self.db.execute("DELETE FROM %s WHERE key = ?" % self.table, [key])
+            self.db.commit()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+from pytest import raises
+from time import sleep
+
+from cache import Cache
+
+
+def test_get_put():
+    cache = Cache()
+    with raises(KeyError):
+        cache.get("/m/0178g")
+    cache.put("/m/0178g", [{"name": "Boeing", "ticker": "BA"}])
+    assert cache.get("/m/0178g") == [{"name": "Boeing", "ticker": "BA"}]
+    cache.put("/m/017b3j", None)
+    assert cache.get("/m/017b3j") is None
+
+
+def test_max_entries():
+    cache = Cache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert len(cache) == 2
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    with raises(KeyError):
+        cache.get("b")
+
+
+def test_max_bytes():
+    cache = Cache(max_bytes=10, sizeof=len)
+    cache.put("a", "12345")
+    cache.put("b", "1234")
+    assert cache.bytes == 9
+    cache.put("a", "123")
+    assert cache.bytes == 7
+    cache.put("c", "1234")
+    assert cache.bytes == 7
+    assert len(cache) == 2
+    with raises(KeyError):
+        cache.get("b")
+
+
+def test_hits_misses():
+    cache = Cache()
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    with raises(KeyError):
+        cache.get("b")
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+
+def test_ttl():
+    cache = Cache(ttl=0.1)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    sleep(0.2)
+    with raises(KeyError):
+        cache.get("a")
+
+
+def test_persistence(tmpdir):
+    filename = str(tmpdir.join("cache.db"))
+    cache = Cache(max_entries=2, filename=filename)
+    cache.put("a", [{"name": "Ford", "ticker": "F"}])
+    cache.put("b", None)
+    cache.put("c", 3)
+    cache = Cache(max_entries=2, filename=filename)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    with raises(KeyError):
+        cache.get("a")
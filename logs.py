@@ -1,10 +1,25 @@
 # -*- coding: utf-8 -*-
 
+from atexit import register
 from google.cloud import error_reporting
 from google.cloud import logging
 from logging import basicConfig
+from logging import DEBUG
+from logging import ERROR
+from logging import getLevelName
 from logging import getLogger
+from logging import INFO
 from logging import NOTSET
+from logging import WARNING
+from os import getenv
+from Queue import Empty
+from Queue import Full
+from Queue import Queue
+from threading import Lock
+from threading import Thread
+from time import sleep
+from time import time
+from warnings import warn
 
 # The format for local logs.
 LOGS_FORMAT = ("%(asctime)s "
@@ -18,70 +33,295 @@ LOGS_FORMAT = ("%(asctime)s "
 LOG_FILE = "/tmp/trump2cash.log"
 
 
+def get_logs_level(name):
+    """Looks up a log level by its case-insensitive name. Falls back to DEBUG
+    with a warning for unknown names, so no logs are lost by mistake.
+    """
+
+    level = getLevelName(name.upper())
+    if not isinstance(level, int):
+        warn("Unknown log level %r, using DEBUG." % name)
+        return DEBUG
+    return level
+
+
+# The minimum level of logs to record, e.g. INFO in production. Read from an
+# environment variable.
+LOGS_LEVEL = get_logs_level(getenv("LOGS_LEVEL", "DEBUG"))
+
+# The maximum number of cloud logs waiting to be shipped. Any logs beyond that
+# are dropped instead of blocking the caller.
+CLOUD_LOGS_QUEUE_SIZE = 10000
+
+# The maximum number of cloud logs shipped in a single request.
+CLOUD_LOGS_BATCH_SIZE = 100
+
+# The maximum time in seconds a cloud log waits for more logs to batch with.
+CLOUD_LOGS_BATCH_INTERVAL = 1.0
+
+# The number of retries for shipping a batch of cloud logs and the initial
+# delay in seconds between them, which doubles after each retry.
+CLOUD_LOGS_RETRIES = 5
+CLOUD_LOGS_RETRY_DELAY = 0.5
+
+# The maximum time in seconds to wait for pending cloud logs at exit.
+CLOUD_LOGS_FLUSH_TIMEOUT = 5.0
+
+# The number of cloud clients shared by all cloud logs.
+CLOUD_CLIENTS_POOL_SIZE = 4
+
+# The shared shipper for cloud logs, created on first use.
+cloud_log_shipper = None
+cloud_log_shipper_lock = Lock()
+
+# The shared cloud clients, created on first use.
+cloud_clients_pool = []
+cloud_clients_pool_index = 0
+cloud_clients_pool_lock = Lock()
+
+
+def get_cloud_log_shipper():
+    """Returns the shared shipper for cloud logs."""
+
+    global cloud_log_shipper
+    with cloud_log_shipper_lock:
+        if not cloud_log_shipper:
+            cloud_log_shipper = CloudLogShipper()
+            register(cloud_log_shipper.flush, CLOUD_LOGS_FLUSH_TIMEOUT)
+        return cloud_log_shipper
+
+
+def get_cloud_clients():
+    """Returns cloud clients from the shared pool in round-robin order."""
+
+    global cloud_clients_pool_index
+    with cloud_clients_pool_lock:
+        if len(cloud_clients_pool) < CLOUD_CLIENTS_POOL_SIZE:
+            cloud_clients = CloudClients()
+            cloud_clients_pool.append(cloud_clients)
+            return cloud_clients
+
+        cloud_clients = cloud_clients_pool[cloud_clients_pool_index]
+        cloud_clients_pool_index = ((cloud_clients_pool_index + 1) %
+                                    CLOUD_CLIENTS_POOL_SIZE)
+        return cloud_clients
+
+
+class CloudClients:
+    """A pair of Stackdriver logging and error reporting clients shared
+    between cloud logs.
+    """
+
+    def __init__(self):
+        self.logging_client = logging.Client(use_gax=False)
+        self.error_client = error_reporting.Client()
+
+        # The httplib2 instance of the error reporting client isn't
+        # thread-safe, so only send one error report at a time. The logging
+        # client is only used by the shipper thread.
+        self.error_lock = Lock()
+
+    def report_exception(self):
+        """Reports the exception currently being handled."""
+
+        with self.error_lock:
+            self.error_client.report_exception()
+
+
 class Logs:
     """A helper for logging locally or in the cloud."""
 
-    def __init__(self, name, to_cloud=True):
+    def __init__(self, name, to_cloud=True, level=LOGS_LEVEL):
         self.to_cloud = to_cloud
+        self.level = level
         if self.to_cloud:
-            # Use the Stackdriver logging and error reporting clients.
-            self.logger = logging.Client(use_gax=False).logger(name)
-            self.error_client = error_reporting.Client()
+            # Use shared Stackdriver logging and error reporting clients. The
+            # logger itself is just a lightweight view with the name.
+            self.cloud_clients = get_cloud_clients()
+            self.logger = self.cloud_clients.logging_client.logger(name)
+            self.shipper = get_cloud_log_shipper()
         else:
             # Log to a local file.
             self.logger = getLogger(name)
             basicConfig(format=LOGS_FORMAT, level=NOTSET, filename=LOG_FILE)
 
-    def debug(self, text):
+    def debug(self, text, *args):
         """Logs at the DEBUG level."""
 
+        if self.level > DEBUG:
+            return
+        text = self.format(text, args)
+
         if self.to_cloud:
             self.safe_cloud_log(text, severity="DEBUG")
         else:
             self.logger.debug(text)
 
-    def info(self, text):
+    def info(self, text, *args):
         """Logs at the INFO level."""
 
+        if self.level > INFO:
+            return
+        text = self.format(text, args)
+
         if self.to_cloud:
             self.safe_cloud_log(text, severity="INFO")
         else:
             self.logger.info(text)
 
-    def warn(self, text):
+    def warn(self, text, *args):
         """Logs at the WARNING level."""
 
+        if self.level > WARNING:
+            return
+        text = self.format(text, args)
+
         if self.to_cloud:
             self.safe_cloud_log(text, severity="WARNING")
         else:
             self.logger.warning(text)
 
-    def error(self, text):
+    def error(self, text, *args):
         """Logs at the ERROR level."""
 
+        if self.level > ERROR:
+            return
+        text = self.format(text, args)
+
         if self.to_cloud:
             self.safe_cloud_log(text, severity="ERROR")
         else:
             self.logger.error(text)
 
+    def format(self, text, args):
+        """Creates the log text from a format string and its arguments or from
+        a callable, only once the log level is known to be enabled.
+        """
+
+        if callable(text):
+            text = text()
+        if args:
+            text = text % args
+        return text
+
     def catch(self, exception):
         """Logs an exception."""
 
         if self.to_cloud:
-            self.error_client.report_exception()
+            self.cloud_clients.report_exception()
             self.safe_cloud_log(str(exception), severity="CRITICAL")
         else:
             self.logger.critical(str(exception))
 
     def safe_cloud_log(self, text, severity):
-        """Logs to the cloud and catches exceptions if the upload fails."""
+        """Queues a log for shipping to the cloud without blocking."""
+
+        self.shipper.put(self, text, severity)
+
+
+class CloudLogShipper:
+    """A background thread shipping cloud logs in batches."""
+
+    def __init__(self):
+        self.queue = Queue(maxsize=CLOUD_LOGS_QUEUE_SIZE)
+        self.dropped = 0
+        self.dropped_lock = Lock()
+        self.thread = Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, logs, text, severity):
+        """Queues a log and drops it if the queue is full."""
 
-        # TODO: Implement retry logic with exponential backoff.
         try:
-            self.logger.log_text(text, severity=severity)
-        except BaseException as exception:
-            # Note that these calls will attempt new logs, but without the
-            # exception catch to avoid recursion for permanent failures.
-            self.error_client.report_exception()
-            self.logger.log_text(str(exception), severity="CRITICAL")
-            self.logger.log_text("Skipped log: %s" % text, severity="ERROR")
+            self.queue.put_nowait((logs, text, severity))
+        except Full:
+            with self.dropped_lock:
+                self.dropped += 1
+
+    def run(self):
+        """Continuously ships batches of logs from the queue."""
+
+        while True:
+            entries = self.get_batch()
+            try:
+                self.ship(entries)
+            finally:
+                for _ in entries:
+                    self.queue.task_done()
+
+    def get_batch(self):
+        """Waits for the next log and collects more until the batch is full or
+        the batch interval is over.
+        """
+
+        entries = [self.queue.get(block=True)]
+        deadline = time() + CLOUD_LOGS_BATCH_INTERVAL
+        while len(entries) < CLOUD_LOGS_BATCH_SIZE:
+            timeout = deadline - time()
+            if timeout <= 0:
+                break
+            try:
+                entries.append(self.queue.get(block=True, timeout=timeout))
+            except Empty:
+                break
+
+        return entries
+
+    def ship(self, entries):
+        """Ships a batch of logs with one request per logger."""
+
+        # Report any logs dropped since the last batch along with this one.
+        with self.dropped_lock:
+            dropped = self.dropped
+            self.dropped = 0
+        if dropped:
+            logs = entries[0][0]
+            entries.append((logs, "Dropped cloud logs: %s" % dropped,
+                            "WARNING"))
+
+        # Group the logs by logger while keeping their order.
+        loggers = []
+        logger_entries = {}
+        for logs, text, severity in entries:
+            if logs.logger not in logger_entries:
+                loggers.append(logs.logger)
+                logger_entries[logs.logger] = (logs, [])
+            logger_entries[logs.logger][1].append((text, severity))
+
+        for logger in loggers:
+            logs, texts = logger_entries[logger]
+            self.commit(logs, texts)
+
+    def commit(self, logs, texts):
+        """Sends logs for one logger and retries with exponential backoff if
+        the upload fails.
+        """
+
+        delay = CLOUD_LOGS_RETRY_DELAY
+        for retry in range(CLOUD_LOGS_RETRIES + 1):
+            batch = logs.logger.batch()
+            for text, severity in texts:
+                batch.log_text(text, severity=severity)
+            try:
+                batch.commit()
+                return
+            except BaseException:
+                if retry == CLOUD_LOGS_RETRIES:
+                    # Give up on permanent failures, but try to report them.
+                    try:
+                        logs.cloud_clients.report_exception()
+                    except BaseException:
+                        pass
+                    with self.dropped_lock:
+                        self.dropped += len(texts)
+                    return
+                sleep(delay)
+                delay *= 2
+
+    def flush(self, timeout):
+        """Waits until all queued logs are shipped or the timeout is over."""
+
+        deadline = time() + timeout
+        while self.queue.unfinished_tasks and time() < deadline:
+            sleep(0.1)
@@ -1,7 +1,15 @@
 # -*- coding: utf-8 -*-
 
+from logging import DEBUG
+from logging import INFO
+from logging import WARNING
 from pytest import fixture
+from pytest import warns
+from threading import Event
 
+from logs import CloudLogShipper
+from logs import get_cloud_clients
+from logs import get_logs_level
 from logs import Logs
 from logs import LOG_FILE
 
@@ -41,6 +49,35 @@ def test_error(logs, capfd):
     assert get_last_log().endswith(" ERROR error\n")
 
 
+def test_format(logs, capfd):
+    logs.debug("debug %s %s", 1, "two")
+    assert get_last_log().endswith(" DEBUG debug 1 two\n")
+    logs.info(lambda: "info %s" % 3)
+    assert get_last_log().endswith(" INFO info 3\n")
+    logs.warn("warn %s", (4, 5))
+    assert get_last_log().endswith(" WARNING warn (4, 5)\n")
+
+
+def test_level(capfd):
+    logs = Logs("test", to_cloud=False, level=INFO)
+    formatted = []
+    logs.debug(lambda: formatted.append("debug"))
+    assert not formatted
+    logs.info(lambda: formatted.append("info") or "info")
+    assert formatted == ["info"]
+    assert get_last_log().endswith(" INFO info\n")
+
+
+def test_get_logs_level():
+    assert get_logs_level("INFO") == INFO
+    assert get_logs_level("info") == INFO
+    assert get_logs_level("Warning") == WARNING
+    with warns(UserWarning):
+        assert get_logs_level("verbose") == DEBUG
+    with warns(UserWarning):
+        assert get_logs_level("10") == DEBUG
+
+
 def test_catch(logs, capfd):
     try:
         raise Exception("exception")
@@ -49,6 +86,112 @@ def test_catch(logs, capfd):
     assert get_last_log().endswith(" CRITICAL exception\n")
 
 
-def test_safe_cloud_log(logs):
-    # TODO: Implement.
-    pass
+class FakeBatch:
+    """A stand-in for a cloud logging batch which records its commits."""
+
+    def __init__(self, commits, fail):
+        self.commits = commits
+        self.fail = fail
+        self.entries = []
+
+    def log_text(self, text, severity):
+        self.entries.append((text, severity))
+
+    def commit(self):
+        if self.fail:
+            raise IOError("commit")
+        self.commits.append(self.entries)
+
+
+class FakeLogger:
+    """A stand-in for a cloud logger with batches that fail at first."""
+
+    def __init__(self, failures=0):
+        self.commits = []
+        self.failures = failures
+
+    def batch(self):
+        self.failures -= 1
+        return FakeBatch(self.commits, fail=self.failures >= 0)
+
+
+class BlockingBatch(FakeBatch):
+    """A stand-in for a cloud logging batch which waits for a release before
+    committing.
+    """
+
+    def __init__(self, commits, committing, release):
+        FakeBatch.__init__(self, commits, fail=False)
+        self.committing = committing
+        self.release = release
+
+    def commit(self):
+        self.committing.set()
+        self.release.wait()
+        FakeBatch.commit(self)
+
+
+class BlockingLogger:
+    """A stand-in for a cloud logger with batches that wait for a release."""
+
+    def __init__(self):
+        self.commits = []
+        self.committing = Event()
+        self.release = Event()
+
+    def batch(self):
+        return BlockingBatch(self.commits, self.committing, self.release)
+
+
+class FakeLogs:
+    """A stand-in for cloud logs."""
+
+    def __init__(self, logger):
+        self.logger = logger
+
+
+def test_get_cloud_clients(monkeypatch):
+    built = []
+
+    def make_cloud_clients():
+        built.append(object())
+        return built[-1]
+
+    monkeypatch.setattr("logs.CloudClients", make_cloud_clients)
+    monkeypatch.setattr("logs.cloud_clients_pool", [])
+    monkeypatch.setattr("logs.cloud_clients_pool_index", 0)
+
+    # Build clients up to the pool size, then reuse them in turn.
+    cloud_clients = [get_cloud_clients() for _ in range(10)]
+    assert len(built) == 4
+    assert cloud_clients == built + built + built[:2]
+
+
+def test_cloud_log_shipper():
+    shipper = CloudLogShipper()
+    logs = FakeLogs(FakeLogger(failures=1))
+    shipper.put(logs, "debug", "DEBUG")
+    shipper.put(logs, "info", "INFO")
+    shipper.flush(timeout=5)
+    assert logs.logger.commits == [[("debug", "DEBUG"), ("info", "INFO")]]
+
+
+def test_cloud_log_shipper_full(monkeypatch):
+    monkeypatch.setattr("logs.CLOUD_LOGS_QUEUE_SIZE", 1)
+    monkeypatch.setattr("logs.CLOUD_LOGS_BATCH_INTERVAL", 0)
+    shipper = CloudLogShipper()
+    logs = FakeLogs(BlockingLogger())
+
+    # Fill the queue while the first log is being shipped and drop the rest.
+    shipper.put(logs, "debug", "DEBUG")
+    assert logs.logger.committing.wait(5)
+    shipper.put(logs, "info", "INFO")
+    shipper.put(logs, "warn", "WARNING")
+    assert shipper.dropped == 1
+
+    # Report the dropped logs with the next batch.
+    logs.logger.release.set()
+    shipper.flush(timeout=5)
+    assert logs.logger.commits == [
+        [("debug", "DEBUG")],
+        [("info", "INFO"), ("Dropped cloud logs: 1", "WARNING")]]
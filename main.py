@@ -1,41 +1,121 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+from multiprocessing.pool import ThreadPool
+from threading import local
+
 from analysis import Analysis
+from analysis import make_company_data_cache
 from logs import Logs
 from trading import Trading
+from twitter import LAST_TWEET_ID_FILE
 from twitter import Twitter
 
 # Whether to send all logs to the cloud instead of a local file.
 LOGS_TO_CLOUD = True
 
+# The number of threads fetching market data concurrently with the analysis.
+NUM_PREFETCH_THREADS = 10
+
+# The long-lived helpers of each thread. They are kept per thread since the
+# httplib2 instances of their clients can't be shared between threads. Their
+# caches are shared instead.
+thread_helpers = local()
+
+
+def get_analysis():
+    """Returns the Analysis instance of the current thread."""
+
+    try:
+        return thread_helpers.analysis
+    except AttributeError:
+        thread_helpers.analysis = Analysis(
+            logs_to_cloud=LOGS_TO_CLOUD,
+            company_data_cache=company_data_cache)
+        return thread_helpers.analysis
+
+
+def get_trading():
+    """Returns the Trading instance of the current thread."""
+
+    try:
+        return thread_helpers.trading
+    except AttributeError:
+        thread_helpers.trading = Trading(logs_to_cloud=LOGS_TO_CLOUD)
+        return thread_helpers.trading
+
+
+def fetch_market_status():
+    """Looks up the market status on a prefetch thread."""
+
+    return get_trading().get_market_status()
+
+
+def fetch_balance():
+    """Looks up the account balance on a prefetch thread."""
+
+    return get_trading().get_balance()
+
+
+def fetch_last_price(ticker):
+    """Looks up the last price of a stock on a prefetch thread."""
+
+    return get_trading().get_last_price(ticker)
+
 
 def twitter_callback(tweet):
     """Analyzes Trump tweets, makes stock trades, and sends tweet alerts."""
 
-    # Initialize these here to create separate httplib2 instances per thread.
-    analysis = Analysis(logs_to_cloud=LOGS_TO_CLOUD)
-    trading = Trading(logs_to_cloud=LOGS_TO_CLOUD)
+    # Start looking up the market data right away, since it doesn't depend on
+    # the analysis.
+    market_status = prefetch_pool.apply_async(fetch_market_status)
+    balance = prefetch_pool.apply_async(fetch_balance)
+
+    analysis = get_analysis()
+    trading = get_trading()
 
     companies = analysis.find_companies(tweet)
-    logs.debug("Using companies: %s" % companies)
+    logs.debug("Using companies: %s", companies)
     if companies:
-        trading.make_trades(companies)
+        # Look up the prices for all companies in parallel, then trade as soon
+        # as all market data is in.
+        tickers = set([company["ticker"] for company in companies])
+        prices = dict([(ticker, prefetch_pool.apply_async(
+            fetch_last_price, [ticker])) for ticker in tickers])
+        trading.make_trades(
+            companies,
+            market_status=market_status.get(),
+            balance=balance.get(),
+            prices=dict([(ticker, price.get()) for ticker, price in
+                         prices.iteritems()]))
         twitter.tweet(companies, tweet)
 
 
 if __name__ == "__main__":
     logs = Logs(name="main", to_cloud=LOGS_TO_CLOUD)
+    prefetch_pool = ThreadPool(processes=NUM_PREFETCH_THREADS)
+    company_data_cache = make_company_data_cache()
+
+    # The worker threads and queued tweets outlive the streams, so only the
+    # stream is replaced on restart. Keep the last processed tweet across
+    # restarts to skip replays.
+    twitter = Twitter(logs_to_cloud=LOGS_TO_CLOUD,
+                      last_tweet_id_file=LAST_TWEET_ID_FILE)
 
     # Restart in a loop if there are any errors so we stay up.
     while True:
         logs.info("Starting new session.")
 
-        twitter = Twitter(logs_to_cloud=LOGS_TO_CLOUD)
         try:
             twitter.start_streaming(twitter_callback)
+        except (KeyboardInterrupt, SystemExit):
+            logs.info("Shutting down.")
+            break
         except BaseException as exception:
             logs.catch(exception)
         finally:
             twitter.stop_streaming()
             logs.info("Ending session.")
+
+    # Process the queued tweets before exiting.
+    twitter.shutdown()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_right
+from calendar import timegm
+from datetime import datetime
+from datetime import timedelta
+from numpy import array
+from numpy import int64
+from numpy import logical_and
+from numpy import searchsorted
+from numpy import where
+from pytz import utc
+
+# The start of the UNIX epoch as a naive UTC datetime.
+EPOCH = datetime(1970, 1, 1)
+
+
+def get_seconds(delta):
+    """Converts a timedelta to whole seconds."""
+
+    return delta.days * 86400 + delta.seconds
+
+
+class MarketTimeConverter:
+    """Converts between UTC and the local time of a pytz timezone using the
+    UTC offset transitions of the timezone, precomputed once. Local times are
+    resolved like the default pytz localize (is_dst=False).
+    """
+
+    def __init__(self, tz):
+        self.tz = tz
+
+        # The UTC epoch seconds where each period with a fixed offset starts.
+        self.utc_starts = [timegm(transition.timetuple()) for transition in
+                           tz._utc_transition_times]
+
+        # The offset, DST flag, and pytz tzinfo instance of each period.
+        self.offsets = [get_seconds(info[0]) for info in tz._transition_info]
+        self.dsts = [bool(info[1]) for info in tz._transition_info]
+        self.tzinfos = [tz._tzinfos[info] for info in tz._transition_info]
+
+        # The local epoch seconds where each period starts.
+        self.local_starts = [start + offset for start, offset in
+                             zip(self.utc_starts, self.offsets)]
+
+        # The same as arrays for the batch conversions.
+        self.utc_starts_array = array(self.utc_starts, dtype=int64)
+        self.local_starts_array = array(self.local_starts, dtype=int64)
+        self.offsets_array = array(self.offsets, dtype=int64)
+        self.dsts_array = array(self.dsts, dtype=bool)
+
+    def get_utc_period(self, seconds):
+        """Finds the index of the period containing the UTC epoch seconds."""
+
+        return max(0, bisect_right(self.utc_starts, seconds) - 1)
+
+    def get_local_period(self, seconds):
+        """Finds the index of the period to use for the local epoch seconds.
+        Times in the gap at the start of DST use the period before the gap.
+        Ambiguous times at the end of DST use the period without DST.
+        """
+
+        index = max(0, bisect_right(self.local_starts, seconds) - 1)
+
+        # The previous period overlaps this one if the clocks were set back.
+        if (index > 0 and
+                seconds - self.offsets[index - 1] < self.utc_starts[index] and
+                not self.dsts[index - 1] and self.dsts[index]):
+            return index - 1
+
+        return index
+
+    def epoch_to_market_time(self, seconds):
+        """Converts UTC epoch seconds to an aware datetime in market time."""
+
+        index = self.get_utc_period(seconds)
+        market_time = EPOCH + timedelta(seconds=seconds + self.offsets[index])
+        return market_time.replace(tzinfo=self.tzinfos[index])
+
+    def market_time_to_epoch(self, timestamp):
+        """Converts a naive datetime in market time to UTC epoch seconds."""
+
+        seconds = get_seconds(timestamp - EPOCH)
+        return seconds - self.offsets[self.get_local_period(seconds)]
+
+    def utc_to_market_time(self, timestamp):
+        """Converts a naive UTC datetime to an aware datetime in market time.
+        """
+
+        index = self.get_utc_period(get_seconds(timestamp - EPOCH))
+        market_time = timestamp + timedelta(seconds=self.offsets[index])
+        return market_time.replace(tzinfo=self.tzinfos[index])
+
+    def market_time_to_utc(self, timestamp):
+        """Converts a naive datetime in market time to an aware UTC datetime.
+        """
+
+        index = self.get_local_period(get_seconds(timestamp - EPOCH))
+        utc_time = timestamp - timedelta(seconds=self.offsets[index])
+        return utc_time.replace(tzinfo=utc)
+
+    def localize(self, timestamp):
+        """Attaches the market timezone to a naive datetime in market time."""
+
+        index = self.get_local_period(get_seconds(timestamp - EPOCH))
+        return timestamp.replace(tzinfo=self.tzinfos[index])
+
+    def epochs_to_market_times(self, seconds):
+        """Converts an array of UTC epoch seconds to local epoch seconds in
+        market time.
+        """
+
+        indices = searchsorted(self.utc_starts_array, seconds, side="right")
+        return seconds + self.offsets_array[(indices - 1).clip(0)]
+
+    def market_times_to_epochs(self, seconds):
+        """Converts an array of local epoch seconds in market time to UTC
+        epoch seconds.
+        """
+
+        indices = (searchsorted(self.local_starts_array, seconds,
+                                side="right") - 1).clip(0)
+
+        # Same as get_local_period for the overlap at the end of DST.
+        previous = (indices - 1).clip(0)
+        overlapped = logical_and(
+            indices > 0,
+            seconds - self.offsets_array[previous] <
+            self.utc_starts_array[indices])
+        overlapped = logical_and(overlapped, logical_and(
+            ~self.dsts_array[previous], self.dsts_array[indices]))
+        indices = where(overlapped, previous, indices)
+
+        return seconds - self.offsets_array[indices]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from numpy import array
+from numpy import int64
+from pytest import fixture
+from pytz import timezone
+from pytz import utc
+
+from market_time import MarketTimeConverter
+
+# The timezone to test the conversions with.
+TIMEZONE = timezone("US/Eastern")
+
+
+@fixture
+def converter():
+    return MarketTimeConverter(TIMEZONE)
+
+
+def test_utc_to_market_time(converter):
+    assert converter.utc_to_market_time(datetime(
+        2017, 1, 3, 16, 44, 13)) == TIMEZONE.localize(datetime(
+            2017, 1, 3, 11, 44, 13))
+    market_time = converter.utc_to_market_time(datetime(2016, 7, 1, 14))
+    assert market_time.replace(tzinfo=None) == datetime(2016, 7, 1, 10)
+    assert market_time.tzname() == "EDT"
+
+
+def test_market_time_to_utc(converter):
+    assert converter.market_time_to_utc(datetime(
+        2017, 1, 3, 11, 44, 13)) == datetime(
+        2017, 1, 3, 16, 44, 13, tzinfo=utc)
+    assert converter.market_time_to_utc(datetime(
+        2016, 7, 1, 10)) == datetime(2016, 7, 1, 14, tzinfo=utc)
+
+
+def test_transitions(converter):
+    # The clocks skip from 2:00 to 3:00 and go back from 2:00 to 1:00.
+    for timestamp in [datetime(2017, 3, 12, 1, 59), datetime(2017, 3, 12, 2),
+                      datetime(2017, 3, 12, 2, 30), datetime(2017, 3, 12, 3),
+                      datetime(2016, 11, 6, 0, 59), datetime(2016, 11, 6, 1),
+                      datetime(2016, 11, 6, 1, 30), datetime(2016, 11, 6, 2)]:
+        assert converter.localize(timestamp) == TIMEZONE.localize(timestamp)
+        assert converter.market_time_to_utc(timestamp) == TIMEZONE.localize(
+            timestamp).astimezone(utc)
+
+
+def test_epoch_to_market_time(converter):
+    assert converter.epoch_to_market_time(1483461853) == TIMEZONE.localize(
+        datetime(2017, 1, 3, 11, 44, 13))
+    assert converter.market_time_to_epoch(datetime(
+        2017, 1, 3, 11, 44, 13)) == 1483461853
+
+
+def test_batch(converter):
+    epochs = array([1483461853, 1467381600, 1478410200, 1478413800],
+                   dtype=int64)
+    market_times = array([1483443853, 1467367200, 1478395800, 1478395800],
+                         dtype=int64)
+    assert (converter.epochs_to_market_times(epochs) == market_times).all()
+    assert (converter.market_times_to_epochs(market_times) == array(
+        [1483461853, 1467381600, 1478413800, 1478413800])).all()
@@ -1,20 +1,33 @@
 # -*- coding: utf-8 -*-
 
+from calendar import timegm
 from datetime import datetime
-from datetime import timedelta
+from glob import glob
+from numpy import int64
+from numpy import load
+from numpy import loadtxt
+from numpy import savez
+from numpy import searchsorted
 from simplejson import loads
 from oauth2 import Consumer
 from oauth2 import Client
 from oauth2 import Token
+from os import fdopen
 from os import getenv
 from os import path
+from os import remove
+from os import rename
 from pytz import timezone
-from pytz import utc
 from lxml.etree import Element
 from lxml.etree import SubElement
 from lxml.etree import tostring
+from tempfile import mkstemp
+from zipfile import BadZipfile
 
+from cache import Cache
 from logs import Logs
+from market_time import MarketTimeConverter
+from trading_calendar import TradingCalendar
 
 # Read the authentication keys for TradeKing from environment variables.
 TRADEKING_CONSUMER_KEY = getenv("TRADEKING_CONSUMER_KEY")
@@ -40,82 +53,105 @@ FIXML_HEADERS = {"Content-Type": "text/xml"}
 # The amount of cash in dollars to hold from being spent.
 CASH_HOLD = 1000
 
+# The sentiment magnitude up to which a company is treated as neutral.
+SENTIMENT_THRESHOLD = 0
+
 # Blacklsited stock ticker symbols, e.g. to avoid insider trading.
 TICKER_BLACKLIST = ["GOOG", "GOOGL"]
 
 # We're using NYSE and NASDAQ, which are both in the easters timezone.
 MARKET_TIMEZONE = timezone("US/Eastern")
 
-# TODO: Use a comprehensive list.
-# A list of days where the markets are closed apart from weekends.
-TRADING_HOLIDAYS = [MARKET_TIMEZONE.localize(date) for date in [
-    datetime(2017, 1, 2)]]
+# The precomputed conversions between UTC and market time.
+MARKET_TIME = MarketTimeConverter(MARKET_TIMEZONE)
+
+# The calendar of days where the markets are open.
+TRADING_CALENDAR = TradingCalendar()
 
 # The filename pattern for historical market data.
 MARKET_DATA_FILE = "market_data/%s_%s.txt"
 
+# The filename pattern for historical market data in the binary format.
+MARKET_DATA_BINARY_FILE = "market_data/%s_%s.npz"
+
+# The columns of the historical market data after the ticker.
+MARKET_DATA_COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+
+# The maximum memory in bytes for keeping days of market data loaded.
+DAY_DATA_CACHE_BYTES = 64 * 1024 * 1024
+
 
 class Trading:
     """A helper for making stock trades."""
 
     def __init__(self, logs_to_cloud):
         self.logs = Logs(name="trading", to_cloud=logs_to_cloud)
-
-    def make_trades(self, companies):
-        """Executes trades for the specified companies based on sentiment."""
+        self.client = None
+        self.day_data_cache = Cache(max_bytes=DAY_DATA_CACHE_BYTES,
+                                    sizeof=self.get_day_data_bytes)
+
+    def make_trades(self, companies, market_status=None, balance=None,
+                    prices=None):
+        """Executes trades for the specified companies based on sentiment. The
+        market status, balance and last prices by ticker are looked up unless
+        they are passed in, e.g. after fetching them concurrently.
+        """
 
         # Determine whether the markets are open.
-        market_status = self.get_market_status()
+        if market_status is None:
+            market_status = self.get_market_status()
         if not market_status:
             self.logs.error("Not trading without market status.")
             return False
 
         # Filter for any strategies resulting in trades.
         actionable_strategies = []
-        market_status = self.get_market_status()
         for company in companies:
             strategy = self.get_strategy(company, market_status)
             if strategy["action"] != "hold":
                 actionable_strategies.append(strategy)
             else:
-                self.logs.warn("Dropping strategy: %s" % strategy)
+                self.logs.warn("Dropping strategy: %s", strategy)
 
         if not actionable_strategies:
             self.logs.warn("No actionable strategies for trading.")
             return False
 
         # Calculate the budget per strategy.
-        balance = self.get_balance()
+        if balance is None:
+            balance = self.get_balance()
         budget = self.get_budget(balance, len(actionable_strategies))
 
         if not budget:
-            self.logs.warn("No budget for trading: %s %s %s" %
-                           (budget, balance, actionable_strategies))
+            self.logs.warn("No budget for trading: %s %s %s",
+                           budget, balance, actionable_strategies)
             return False
 
-        self.logs.debug("Using budget: %s x $%s" %
-                        (len(actionable_strategies), budget))
+        self.logs.debug("Using budget: %s x $%s",
+                        len(actionable_strategies), budget)
 
         # Handle trades for each strategy.
         success = True
         for strategy in actionable_strategies:
             ticker = strategy["ticker"]
             action = strategy["action"]
+            price = prices.get(ticker) if prices else None
 
             # TODO: Use limits for orders.
             # Execute the strategy.
             if action == "bull":
-                self.logs.debug("Bull: %s %s" % (ticker, budget))
-                success = success and self.bull(ticker, budget)
+                self.logs.debug("Bull: %s %s", ticker, budget)
+                success = success and self.bull(ticker, budget, price)
             elif action == "bear":
-                self.logs.debug("Bear: %s %s" % (ticker, budget))
-                success = success and self.bear(ticker, budget)
+                self.logs.debug("Bear: %s %s", ticker, budget)
+                success = success and self.bear(ticker, budget, price)
             else:
-                self.logs.error("Unknown strategy: %s" % strategy)
+                self.logs.error("Unknown strategy: %s", strategy)
 
         return success
 
-    def get_strategy(self, company, market_status):
+    def get_strategy(self, company, market_status,
+                     sentiment_threshold=SENTIMENT_THRESHOLD):
         """Determines the strategy for trading a company based on sentiment and
         market status.
         """
@@ -145,7 +181,7 @@ class Trading:
             return strategy
 
         # Can't trade without sentiment.
-        if sentiment == 0:
+        if abs(sentiment) <= sentiment_threshold:
             strategy["action"] = "hold"
             strategy["reason"] = "neutral sentiment"
             return strategy
@@ -182,199 +218,294 @@ class Trading:
             clock_response = response["response"]
             current = clock_response["status"]["current"]
         except KeyError:
-            self.logs.error("Malformed clock response: %s" % response)
+            self.logs.error("Malformed clock response: %s", response)
             return None
 
         if current not in ["pre", "open", "after", "close"]:
-            self.logs.error("Unknown market status: %s" % current)
+            self.logs.error("Unknown market status: %s", current)
             return None
 
-        self.logs.debug("Current market status: %s" % current)
+        self.logs.debug("Current market status: %s", current)
         return current
 
     def get_historical_prices(self, ticker, timestamp):
         """Finds the last price at or before a timestamp and at EOD."""
 
         # Start with today's quotes.
-        quotes = self.get_day_quotes(ticker, timestamp)
-        if not quotes:
-            self.logs.warn("No quotes for day: %s" % timestamp)
+        day_data = self.get_day_data(ticker, timestamp)
+        if day_data is None or not len(day_data["time"]):
+            self.logs.warn("No quotes for day: %s", timestamp)
             return None
 
+        # The quote times are in whole UTC epoch minutes, sorted ascending.
+        times = day_data["time"]
+        prices = day_data["open"]
+        epoch_minutes = timegm(timestamp.utctimetuple()) / 60.0
+
         # Depending on where we land relative to the trading day, pick the
-        # right quote and EOD quote.
-        first_quote = quotes[0]
-        first_quote_time = first_quote["time"]
-        last_quote = quotes[-1]
-        last_quote_time = last_quote["time"]
-        if timestamp < first_quote_time:
+        # right quote and EOD quote. The last quote of a day is the EOD quote.
+        if epoch_minutes < times[0]:
             self.logs.debug("Using previous quote.")
             previous_day = self.get_previous_day(timestamp)
-            previous_quotes = self.get_day_quotes(ticker, previous_day)
-            if not previous_quotes:
-                self.logs.error("No quotes for previous day: %s" %
-                                previous_day)
+            previous_data = self.get_day_data(ticker, previous_day)
+            if previous_data is None or not len(previous_data["time"]):
+                self.logs.error("No quotes for previous day: %s", previous_day)
                 return None
-            quote_at = previous_quotes[-1]
-            quote_eod = last_quote
-        elif timestamp >= first_quote_time and timestamp <= last_quote_time:
+            price_at = previous_data["open"][-1]
+            price_eod = prices[-1]
+        elif epoch_minutes <= times[-1]:
             self.logs.debug("Using closest quote.")
-            # Walk through the quotes unitl we stepped over the timestamp.
-            previous_quote = first_quote
-            for quote in quotes:
-                quote_time = quote["time"]
-                if quote_time > timestamp:
-                    break
-                previous_quote = quote
-            quote_at = previous_quote
-            quote_eod = last_quote
-        else:  # timestamp > last_quote_time
+            # Binary search for the last quote at or before the timestamp.
+            index = searchsorted(times, epoch_minutes, side="right") - 1
+            price_at = prices[index]
+            price_eod = prices[-1]
+        else:  # epoch_minutes > times[-1]
             self.logs.debug("Using last quote.")
-            quote_at = last_quote
+            price_at = prices[-1]
             next_day = self.get_next_day(timestamp)
-            next_quotes = self.get_day_quotes(ticker, next_day)
-            if not next_quotes:
-                self.logs.error("No quotes for next day: %s" % next_day)
+            next_data = self.get_day_data(ticker, next_day)
+            if next_data is None or not len(next_data["time"]):
+                self.logs.error("No quotes for next day: %s", next_day)
                 return None
-            quote_eod = next_quotes[-1]
+            price_eod = next_data["open"][-1]
 
-        self.logs.debug("Using quotes: %s %s" % (quote_at, quote_eod))
-        return {"at": quote_at["price"], "eod": quote_eod["price"]}
+        self.logs.debug("Using prices: %s %s", price_at, price_eod)
+        return {"at": float(price_at), "eod": float(price_eod)}
 
     def get_day_quotes(self, ticker, timestamp):
         """Collects all quotes from the day of the market timestamp."""
 
+        day_data = self.get_day_data(ticker, timestamp)
+        if day_data is None:
+            return None
+
+        quotes = []
+        for time, price in zip(day_data["time"], day_data["open"]):
+            market_time = MARKET_TIME.epoch_to_market_time(60 * int(time))
+            quote = {"time": market_time, "price": float(price)}
+            quotes.append(quote)
+
+        return quotes
+
+    def get_day_data(self, ticker, timestamp):
+        """Loads the market data columns from the day of the market timestamp
+        and converts the data to the binary format first if needed.
+        """
+
         # The timestamp is expected in market time.
         day = timestamp.strftime("%Y%m%d")
+
+        # Use the data from memory if the day was loaded before.
+        cache_key = "%s_%s" % (ticker, day)
+        try:
+            return self.day_data_cache.get(cache_key)
+        except KeyError:
+            self.logs.debug("Day data cache miss for %s: %s hits %s misses"
+                            " %s bytes", cache_key, self.day_data_cache.hits,
+                            self.day_data_cache.misses,
+                            self.day_data_cache.bytes)
+
         filename = MARKET_DATA_FILE % (ticker, day)
+        binary_filename = MARKET_DATA_BINARY_FILE % (ticker, day)
 
         if not path.isfile(filename):
-            self.logs.error("Day quotes not on file for: %s %s" %
-                            (ticker, timestamp))
+            self.logs.error("Day quotes not on file for: %s %s",
+                            ticker, timestamp)
             return None
 
-        quotes_file = open(filename, "r")
+        # Convert the data unless it's already up to date.
+        if (not path.isfile(binary_filename) or
+                path.getmtime(binary_filename) < path.getmtime(filename)):
+            if not self.ingest_day_data(filename, binary_filename):
+                return None
+
+        # Convert the data again if the binary file is corrupt.
+        day_data = self.read_day_data(binary_filename)
+        if day_data is None:
+            if not self.ingest_day_data(filename, binary_filename):
+                return None
+            day_data = self.read_day_data(binary_filename)
+            if day_data is None:
+                return None
+
+        # The cached columns are shared, so make sure they aren't modified.
+        for column in day_data.values():
+            column.setflags(write=False)
+        self.day_data_cache.put(cache_key, day_data)
+
+        return day_data
+
+    def read_day_data(self, binary_filename):
+        """Reads the columns of a day of market data from the binary format or
+        returns None if the file can't be read.
+        """
+
         try:
-            lines = quotes_file.readlines()
-            quotes = []
-
-            # Skip the header line, then read the quotes.
-            for line in lines[1:]:
-                columns = line.split(",")
-
-                market_time_str = columns[1]
-                try:
-                    market_time = MARKET_TIMEZONE.localize(datetime.strptime(
-                        market_time_str, "%Y%m%d%H%M"))
-                except ValueError:
-                    self.logs.error("Failed to decode market time: %s" %
-                                    market_time_str)
-                    return None
-
-                price_str = columns[2]
-                try:
-                    price = float(price_str)
-                except ValueError:
-                    self.logs.error("Failed to decode price: %s" % price_str)
-                    return None
-
-                quote = {"time": market_time, "price": price}
-                quotes.append(quote)
-
-            return quotes
-        except IOError as exception:
-            self.logs.error("Failed to read quotes cache file: %s" % exception)
+            binary_file = load(binary_filename)
+            try:
+                return dict([(column, binary_file[column]) for column in
+                             MARKET_DATA_COLUMNS])
+            finally:
+                binary_file.close()
+        except (IOError, ValueError, KeyError, BadZipfile) as exception:
+            self.logs.error("Failed to read quotes binary file: %s %s",
+                            binary_filename, exception)
             return None
-        finally:
-            quotes_file.close()
 
-    def is_trading_day(self, timestamp):
-        """Tests whether markets are open on a given day."""
+    def get_day_data_bytes(self, day_data):
+        """Calculates the memory used by the columns of a day of market data.
+        """
 
-        day = timestamp.replace(hour=0, minute=0, second=0)
+        return sum([column.nbytes for column in day_data.values()])
 
-        # Markets are closed on holidays.
-        if day in TRADING_HOLIDAYS:
-            self.logs.debug("Identified holiday: %s" % timestamp)
+    def ingest_day_data(self, filename, binary_filename):
+        """Converts a day of market data from CSV to the binary format, with
+        UTC epoch minutes and float OHLCV columns.
+        """
+
+        # Skip the header line and the ticker column, then read the quotes.
+        try:
+            rows = loadtxt(filename, delimiter=",", skiprows=1,
+                           usecols=range(1, len(MARKET_DATA_COLUMNS) + 1),
+                           ndmin=2)
+        except (IOError, ValueError) as exception:
+            self.logs.error("Failed to read quotes file: %s %s",
+                            filename, exception)
             return False
 
-        # Markets are closed on weekends.
-        if day.weekday() in [5, 6]:
-            self.logs.debug("Identified weekend: %s" % timestamp)
+        # Split the market times into their fields and convert them to UTC
+        # for all rows at once.
+        market_times = rows[:, 0].astype(int64)
+        years = market_times // 100000000
+        months = market_times // 1000000 % 100
+        days = market_times // 10000 % 100
+        hours = market_times // 100 % 100
+        minutes = market_times % 100
+        month_starts = (years - 1970).astype("M8[Y]").astype("M8[M]") + (
+            months - 1)
+        dates = month_starts.astype("M8[D]") + (days - 1)
+        overflows = dates.astype("M8[M]") != month_starts
+        if ((months < 1) | (months > 12) | (days < 1) | (hours > 23) |
+                (minutes > 59) | overflows).any():
+            self.logs.error("Failed to decode market times: %s", filename)
+            return False
+        local_seconds = (dates.astype(int64) * 86400 + hours * 3600 +
+                         minutes * 60)
+        times = MARKET_TIME.market_times_to_epochs(local_seconds) // 60
+
+        columns = {"time": times}
+        for index, column in enumerate(MARKET_DATA_COLUMNS[1:]):
+            columns[column] = rows[:, index + 1]
+
+        # Write to a unique temporary file first so readers never see partial
+        # data, even with concurrent writers.
+        temp_filename = None
+        try:
+            temp_descriptor, temp_filename = mkstemp(
+                dir=path.dirname(binary_filename), suffix=".tmp")
+            temp_file = fdopen(temp_descriptor, "wb")
+            try:
+                savez(temp_file, **columns)
+            finally:
+                temp_file.close()
+            rename(temp_filename, binary_filename)
+        except (IOError, OSError) as exception:
+            self.logs.error("Failed to write quotes binary file: %s",
+                            exception)
+            if temp_filename and path.isfile(temp_filename):
+                remove(temp_filename)
             return False
 
-        # Otherwise markets are open.
         return True
 
+    def ingest_market_data(self):
+        """Converts all historical market data to the binary format."""
+
+        for filename in sorted(glob(MARKET_DATA_FILE % ("*", "*"))):
+            binary_filename = "%s.npz" % path.splitext(filename)[0]
+            if (not path.isfile(binary_filename) or
+                    path.getmtime(binary_filename) < path.getmtime(filename)):
+                self.logs.debug("Ingesting market data: %s", filename)
+                self.ingest_day_data(filename, binary_filename)
+
+    def is_trading_day(self, timestamp):
+        """Tests whether markets are open on a given day."""
+
+        return TRADING_CALENDAR.is_trading_day(timestamp.date())
+
+    def is_early_close(self, timestamp):
+        """Tests whether markets close early (at 1 PM) on a given day."""
+
+        return TRADING_CALENDAR.is_early_close(timestamp.date())
+
     def get_previous_day(self, timestamp):
         """Finds the previous trading day."""
 
-        previous_day = timestamp - timedelta(days=1)
-
-        # Walk backwards until we hit a trading day.
-        while not self.is_trading_day(previous_day):
-            previous_day -= timedelta(days=1)
+        previous_date = TRADING_CALENDAR.get_previous_day(timestamp.date())
+        previous_day = MARKET_TIME.localize(
+            datetime.combine(previous_date, timestamp.time()))
 
-        self.logs.debug("Previous trading day for %s: %s" %
-                        (timestamp, previous_day))
+        self.logs.debug("Previous trading day for %s: %s",
+                        timestamp, previous_day)
         return previous_day
 
     def get_next_day(self, timestamp):
         """Finds the next trading day."""
 
-        next_day = timestamp + timedelta(days=1)
-
-        # Walk forward until we hit a trading day.
-        while not self.is_trading_day(next_day):
-            next_day += timedelta(days=1)
+        next_date = TRADING_CALENDAR.get_next_day(timestamp.date())
+        next_day = MARKET_TIME.localize(
+            datetime.combine(next_date, timestamp.time()))
 
-        self.logs.debug("Next trading day for %s: %s" %
-                        (timestamp, next_day))
+        self.logs.debug("Next trading day for %s: %s", timestamp, next_day)
         return next_day
 
     def utc_to_market_time(self, timestamp):
         """Converts a UTC timestamp to local market time."""
 
-        utc_time = utc.localize(timestamp)
-        market_time = utc_time.astimezone(MARKET_TIMEZONE)
-
-        return market_time
+        return MARKET_TIME.utc_to_market_time(timestamp)
 
     def market_time_to_utc(self, timestamp):
         """Converts a timestamp in local market time to UTC."""
 
-        market_time = MARKET_TIMEZONE.localize(timestamp)
-        utc_time = market_time.astimezone(utc)
-
-        return utc_time
+        return MARKET_TIME.market_time_to_utc(timestamp)
 
     def as_market_time(self, year, month, day, hour=0, minute=0, second=0):
         """Creates a timestamp in market time."""
 
         market_time = datetime(year, month, day, hour, minute, second)
-        return MARKET_TIMEZONE.localize(market_time)
+        return MARKET_TIME.localize(market_time)
 
     def make_request(self, url, method="GET", body="", headers=None):
         """Makes a request to the TradeKing API."""
 
-        consumer = Consumer(key=TRADEKING_CONSUMER_KEY,
-                            secret=TRADEKING_CONSUMER_SECRET)
-        token = Token(key=TRADEKING_ACCESS_TOKEN,
-                      secret=TRADEKING_ACCESS_TOKEN_SECRET)
-        client = Client(consumer, token)
+        client = self.get_client()
 
-        self.logs.debug("TradeKing request: %s %s %s %s" %
-                        (url, method, body, headers))
+        self.logs.debug("TradeKing request: %s %s %s %s",
+                        url, method, body, headers)
         response, content = client.request(url, method=method, body=body,
                                            headers=headers)
-        self.logs.debug("TradeKing response: %s %s" % (response, content))
+        self.logs.debug("TradeKing response: %s %s", response, content)
 
         try:
             return loads(content)
         except ValueError:
-            self.logs.error("Failed to decode JSON response: %s" % content)
+            self.logs.error("Failed to decode JSON response: %s", content)
             return None
 
+    def get_client(self):
+        """Returns the OAuth client for TradeKing requests, which keeps its
+        connections alive across requests.
+        """
+
+        if not self.client:
+            consumer = Consumer(key=TRADEKING_CONSUMER_KEY,
+                                secret=TRADEKING_CONSUMER_SECRET)
+            token = Token(key=TRADEKING_ACCESS_TOKEN,
+                          secret=TRADEKING_ACCESS_TOKEN_SECRET)
+            self.client = Client(consumer, token)
+
+        return self.client
+
     def fixml_buy_now(self, ticker, quantity):
         """Generates the FIXML for a buy order at market price."""
 
@@ -465,7 +596,7 @@ class Trading:
             cash_str = money["cash"]
             uncleareddeposits_str = money["uncleareddeposits"]
         except KeyError:
-            self.logs.error("Malformed balances response: %s" % response)
+            self.logs.error("Malformed balances response: %s", response)
             return 0
 
         try:
@@ -473,7 +604,7 @@ class Trading:
             uncleareddeposits = float(uncleareddeposits_str)
             return cash - uncleareddeposits
         except ValueError:
-            self.logs.error("Malformed number in response: %s" % money)
+            self.logs.error("Malformed number in response: %s", money)
             return 0
 
     def get_last_price(self, ticker):
@@ -486,8 +617,7 @@ class Trading:
         response = self.make_request(url=quotes_url)
 
         if not response:
-            self.logs.error("No quotes response for %s: %s" %
-                            (ticker, response))
+            self.logs.error("No quotes response for %s: %s", ticker, response)
             return None
 
         try:
@@ -495,21 +625,21 @@ class Trading:
             quote = quotes["quotes"]["quote"]
             last_str = quote["last"]
         except KeyError:
-            self.logs.error("Malformed quotes response: %s" % response)
+            self.logs.error("Malformed quotes response: %s", response)
             return None
 
-        self.logs.debug("Quote for %s: %s" % (ticker, quote))
+        self.logs.debug("Quote for %s: %s", ticker, quote)
 
         try:
             last = float(last_str)
         except ValueError:
-            self.logs.error("Malformed last for %s: %s" % (ticker, last_str))
+            self.logs.error("Malformed last for %s: %s", ticker, last_str)
             return None
 
         if last > 0:
             return last
         else:
-            self.logs.error("Bad quote for: %s" % ticker)
+            self.logs.error("Bad quote for: %s", ticker)
             return None
 
     def get_order_url(self):
@@ -520,21 +650,22 @@ class Trading:
             url_path += "/preview"
         return TRADEKING_API_URL % url_path
 
-    def get_quantity(self, ticker, budget):
+    def get_quantity(self, ticker, budget, price=None):
         """Calculates the quantity of a stock based on the current market price
-        and a maximum budget.
+        and a maximum budget. The price is looked up unless it is passed in.
         """
 
         # Calculate the quantity based on the current price and the budget.
-        price = self.get_last_price(ticker)
+        if price is None:
+            price = self.get_last_price(ticker)
         if not price:
-            self.logs.error("Failed to determine price for: %s" % ticker)
+            self.logs.error("Failed to determine price for: %s", ticker)
             return None
 
         # Use maximum possible quantity within the budget.
         quantity = int(budget // price)
-        self.logs.debug("Determined quantity %s for %s at $%s within $%s." %
-                        (quantity, ticker, price, budget))
+        self.logs.debug("Determined quantity %s for %s at $%s within $%s.",
+                        quantity, ticker, price, budget)
 
         # If quantity is too low we can't buy.
         if quantity <= 0:
@@ -542,14 +673,14 @@ class Trading:
 
         return quantity
 
-    def bull(self, ticker, budget):
+    def bull(self, ticker, budget, price=None):
         """Executes the bullish strategy on the specified stock within the
         specified budget: Buy now at market rate and sell at market rate at
         close.
         """
 
         # Calculate the quantity.
-        quantity = self.get_quantity(ticker, budget)
+        quantity = self.get_quantity(ticker, budget, price)
         if not quantity:
             self.logs.warn("Not trading without quantity.")
             return False
@@ -566,14 +697,14 @@ class Trading:
 
         return True
 
-    def bear(self, ticker, budget):
+    def bear(self, ticker, budget, price=None):
         """Executes the bearish strategy on the specified stock within the
         specified budget: Sell short at market rate and buy to cover at market
         rate at close.
         """
 
         # Calculate the quantity.
-        quantity = self.get_quantity(ticker, budget)
+        quantity = self.get_quantity(ticker, budget, price)
         if not quantity:
             self.logs.warn("Not trading without quantity.")
             return False
@@ -597,21 +728,21 @@ class Trading:
                                      body=fixml, headers=FIXML_HEADERS)
 
         if not response:
-            self.logs.error("No order response for: %s" % fixml)
+            self.logs.error("No order response for: %s", fixml)
             return False
 
         try:
             order_response = response["response"]
             error = order_response["error"]
         except KeyError:
-            self.logs.error("Malformed order response: %s" % response)
+            self.logs.error("Malformed order response: %s", response)
             return False
 
         # The error field indicates whether the order succeeded.
         error = order_response["error"]
         if error != "Success":
-            self.logs.error("Error in order response: %s %s" %
-                            (error, order_response))
+            self.logs.error("Error in order response: %s %s",
+                            error, order_response)
             return False
 
         return True
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left
+from bisect import bisect_right
+from datetime import date
+from datetime import timedelta
+
+# The range of years covered by the precomputed calendar.
+FIRST_YEAR = 1990
+LAST_YEAR = 2050
+
+# Days where the markets were closed for special events.
+SPECIAL_CLOSURES = [
+    date(1994, 4, 27),  # President Nixon's funeral
+    date(2001, 9, 11),  # September 11 attacks
+    date(2001, 9, 12),
+    date(2001, 9, 13),
+    date(2001, 9, 14),
+    date(2004, 6, 11),  # President Reagan's funeral
+    date(2007, 1, 2),  # President Ford's funeral
+    date(2012, 10, 29),  # Hurricane Sandy
+    date(2012, 10, 30),
+    date(2018, 12, 5),  # President George H. W. Bush's funeral
+    date(2025, 1, 9)]  # President Carter's funeral
+
+# The weekday numbers of Monday and Thursday.
+MONDAY = 0
+THURSDAY = 3
+
+
+def get_nth_weekday(year, month, weekday, n):
+    """Finds the nth (starting at 1) weekday of a month, or the last one for
+    n = -1.
+    """
+
+    if n > 0:
+        first = date(year, month, 1)
+        offset = (weekday - first.weekday()) % 7
+        return first + timedelta(days=offset + 7 * (n - 1))
+    else:
+        if month == 12:
+            last = date(year, 12, 31)
+        else:
+            last = date(year, month + 1, 1) - timedelta(days=1)
+        offset = (last.weekday() - weekday) % 7
+        return last - timedelta(days=offset)
+
+
+def get_easter(year):
+    """Calculates the date of Easter Sunday (Anonymous Gregorian algorithm).
+    """
+
+    a = year % 19
+    b = year // 100
+    c = year % 100
+    d = b // 4
+    e = b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i = c // 4
+    k = c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+def get_observed(holiday):
+    """Moves a holiday on a weekend to the closest weekday."""
+
+    if holiday.weekday() == 5:  # Saturday
+        return holiday - timedelta(days=1)
+    elif holiday.weekday() == 6:  # Sunday
+        return holiday + timedelta(days=1)
+    else:
+        return holiday
+
+
+def get_holidays(year):
+    """Lists the NYSE and NASDAQ holidays of a year."""
+
+    holidays = []
+
+    # New Year's Day isn't moved to the previous Friday if it's a Saturday.
+    new_years_day = date(year, 1, 1)
+    if new_years_day.weekday() != 5:
+        holidays.append(get_observed(new_years_day))
+
+    # Martin Luther King, Jr. Day has been observed since 1998.
+    if year >= 1998:
+        holidays.append(get_nth_weekday(year, 1, MONDAY, 3))
+
+    holidays.append(get_nth_weekday(year, 2, MONDAY, 3))  # Washington's
+    holidays.append(get_easter(year) - timedelta(days=2))  # Good Friday
+    holidays.append(get_nth_weekday(year, 5, MONDAY, -1))  # Memorial Day
+
+    # Juneteenth has been observed since 2022.
+    if year >= 2022:
+        holidays.append(get_observed(date(year, 6, 19)))
+
+    holidays.append(get_observed(date(year, 7, 4)))  # Independence Day
+    holidays.append(get_nth_weekday(year, 9, MONDAY, 1))  # Labor Day
+    holidays.append(get_nth_weekday(year, 11, THURSDAY, 4))  # Thanksgiving
+    holidays.append(get_observed(date(year, 12, 25)))  # Christmas
+
+    holidays.extend([closure for closure in SPECIAL_CLOSURES if
+                     closure.year == year])
+
+    return holidays
+
+
+def get_early_closes(year):
+    """Lists the days of a year where the markets close early at 1 PM, as
+    long as they are trading days.
+    """
+
+    return [
+        date(year, 7, 3),  # Day before Independence Day
+        get_nth_weekday(year, 11, THURSDAY, 4) + timedelta(days=1),  # Black
+        date(year, 12, 24)]  # Christmas Eve
+
+
+class TradingCalendar:
+    """A precomputed calendar of the days when the markets are open."""
+
+    def __init__(self, first_year=FIRST_YEAR, last_year=LAST_YEAR):
+        self.first_ordinal = date(first_year, 1, 1).toordinal()
+        self.last_ordinal = date(last_year, 12, 31).toordinal()
+
+        holidays = set()
+        early_closes = []
+        for year in range(first_year, last_year + 1):
+            holidays.update([day.toordinal() for day in get_holidays(year)])
+            early_closes.extend(
+                [day.toordinal() for day in get_early_closes(year)])
+
+        # Keep the ordinals of all trading days, sorted for bisecting and as a
+        # set for membership tests.
+        self.ordinals = [
+            ordinal for ordinal in
+            range(self.first_ordinal, self.last_ordinal + 1) if
+            date.fromordinal(ordinal).weekday() < 5 and
+            ordinal not in holidays]
+        self.trading_days = set(self.ordinals)
+        self.early_closes = set([ordinal for ordinal in early_closes if
+                                 ordinal in self.trading_days])
+
+    def is_trading_day(self, day):
+        """Tests whether markets are open on a given date."""
+
+        ordinal = day.toordinal()
+        if ordinal < self.first_ordinal or ordinal > self.last_ordinal:
+            raise ValueError("Date outside of calendar: %s" % day)
+
+        return ordinal in self.trading_days
+
+    def is_early_close(self, day):
+        """Tests whether markets close early on a given date."""
+
+        return day.toordinal() in self.early_closes
+
+    def get_previous_day(self, day):
+        """Finds the trading day before a given date."""
+
+        index = bisect_left(self.ordinals, day.toordinal()) - 1
+        if index < 0:
+            raise ValueError("Date outside of calendar: %s" % day)
+
+        return date.fromordinal(self.ordinals[index])
+
+    def get_next_day(self, day):
+        """Finds the trading day after a given date."""
+
+        index = bisect_right(self.ordinals, day.toordinal())
+        if index >= len(self.ordinals):
+            raise ValueError("Date outside of calendar: %s" % day)
+
+        return date.fromordinal(self.ordinals[index])
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+from pytest import fixture
+from pytest import raises
+
+from trading_calendar import get_easter
+from trading_calendar import get_holidays
+from trading_calendar import TradingCalendar
+
+
+@fixture
+def trading_calendar():
+    return TradingCalendar()
+
+
+def test_get_easter():
+    assert get_easter(2016) == date(2016, 3, 27)
+    assert get_easter(2017) == date(2017, 4, 16)
+    assert get_easter(2019) == date(2019, 4, 21)
+    assert get_easter(2038) == date(2038, 4, 25)
+
+
+def test_get_holidays():
+    assert get_holidays(2017) == [
+        date(2017, 1, 2),
+        date(2017, 1, 16),
+        date(2017, 2, 20),
+        date(2017, 4, 14),
+        date(2017, 5, 29),
+        date(2017, 7, 4),
+        date(2017, 9, 4),
+        date(2017, 11, 23),
+        date(2017, 12, 25)]
+    assert get_holidays(2021) == [
+        date(2021, 1, 1),
+        date(2021, 1, 18),
+        date(2021, 2, 15),
+        date(2021, 4, 2),
+        date(2021, 5, 31),
+        date(2021, 7, 5),
+        date(2021, 9, 6),
+        date(2021, 11, 25),
+        date(2021, 12, 24)]
+    assert get_holidays(2022) == [
+        date(2022, 1, 17),
+        date(2022, 2, 21),
+        date(2022, 4, 15),
+        date(2022, 5, 30),
+        date(2022, 6, 20),
+        date(2022, 7, 4),
+        date(2022, 9, 5),
+        date(2022, 11, 24),
+        date(2022, 12, 26)]
+    assert date(2018, 12, 5) in get_holidays(2018)
+
+
+def test_is_trading_day(trading_calendar):
+    assert not trading_calendar.is_trading_day(date(2017, 1, 2))
+    assert trading_calendar.is_trading_day(date(2017, 1, 3))
+    assert not trading_calendar.is_trading_day(date(2017, 1, 7))
+    assert not trading_calendar.is_trading_day(date(2016, 11, 24))
+    assert trading_calendar.is_trading_day(date(2016, 11, 25))
+    assert not trading_calendar.is_trading_day(date(2012, 10, 29))
+    with raises(ValueError):
+        trading_calendar.is_trading_day(date(1900, 1, 2))
+
+
+def test_is_early_close(trading_calendar):
+    assert trading_calendar.is_early_close(date(2016, 11, 25))
+    assert trading_calendar.is_early_close(date(2017, 7, 3))
+    assert trading_calendar.is_early_close(date(2018, 12, 24))
+    assert not trading_calendar.is_early_close(date(2016, 12, 23))
+    assert not trading_calendar.is_early_close(date(2021, 12, 24))
+
+
+def test_get_previous_day(trading_calendar):
+    assert trading_calendar.get_previous_day(
+        date(2017, 1, 3)) == date(2016, 12, 30)
+    assert trading_calendar.get_previous_day(
+        date(2017, 1, 2)) == date(2016, 12, 30)
+    assert trading_calendar.get_previous_day(
+        date(2017, 1, 24)) == date(2017, 1, 23)
+
+
+def test_get_next_day(trading_calendar):
+    assert trading_calendar.get_next_day(
+        date(2016, 12, 30)) == date(2017, 1, 3)
+    assert trading_calendar.get_next_day(
+        date(2017, 1, 1)) == date(2017, 1, 3)
+    assert trading_calendar.get_next_day(
+        date(2017, 1, 27)) == date(2017, 1, 30)
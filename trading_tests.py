@@ -3,8 +3,11 @@
 from datetime import datetime
 from pytest import fixture
 from pytz import utc
+from threading import Thread
 
 from trading import Trading
+from trading import MARKET_DATA_BINARY_FILE
+from trading import MARKET_DATA_FILE
 from trading import MARKET_TIMEZONE
 from trading import TRADEKING_CONSUMER_KEY
 from trading import TRADEKING_CONSUMER_SECRET
@@ -143,6 +146,17 @@ def test_get_strategy_sentiment(trading):
             "root": "Fiat Chrysler Automobiles",
             "sentiment": -0.5,
             "ticker": "FCAU"}
+    assert trading.get_strategy({
+        "exchange": "New York Stock Exchange",
+        "name": "Ford",
+        "sentiment": 0.1,
+        "ticker": "F"}, "open", sentiment_threshold=0.2) == {
+            "action": "hold",
+            "exchange": "New York Stock Exchange",
+            "name": "Ford",
+            "reason": "neutral sentiment",
+            "sentiment": 0.1,
+            "ticker": "F"}
 
 
 def test_get_budget(trading):
@@ -242,6 +256,8 @@ def test_get_order_url(trading):
 
 def test_get_quantity(trading):
     assert trading.get_quantity("F", 10000.0) > 0
+    assert trading.get_quantity("F", 10000.0, 12.5) == 800
+    assert trading.get_quantity("F", 10.0, 12.5) is None
 
 
 def test_get_historical_prices(trading):
@@ -320,6 +336,54 @@ def test_get_day_quotes(trading):
         "price": 157.46, "time": as_market_time(2016, 12, 22, 16, 30, 0)}
 
 
+def test_get_day_data(trading):
+    day_data = trading.get_day_data(
+        "BA", as_market_time(2016, 12, 22, 17, 26, 0))
+    assert len(day_data["time"]) == 395
+    assert day_data["time"][0] == 24706923  # 12/22/2016 9:03 AM
+    assert day_data["open"][0] == 158.73
+    assert day_data["close"][0] == 158.73
+    assert day_data["volume"][0] == 300
+    assert day_data["time"][-1] == 24707370  # 12/22/2016 4:30 PM
+    assert day_data["open"][-1] == 157.46
+    assert trading.get_day_data(
+        "BA", as_market_time(2016, 12, 24, 17, 26, 0)) is None
+    hits = trading.day_data_cache.hits
+    assert trading.get_day_data(
+        "BA", as_market_time(2016, 12, 22, 9, 0, 0)) is day_data
+    assert trading.day_data_cache.hits == hits + 1
+
+
+def test_get_day_data_corrupt(trading):
+    timestamp = as_market_time(2016, 12, 22, 17, 26, 0)
+    assert trading.get_day_data("BA", timestamp)
+
+    # Convert the data again if the binary file is corrupt.
+    binary_file = open(MARKET_DATA_BINARY_FILE % ("BA", "20161222"), "wb")
+    binary_file.write("PK\x03\x04")
+    binary_file.close()
+    trading = Trading(logs_to_cloud=False)
+    assert len(trading.get_day_data("BA", timestamp)["time"]) == 395
+
+
+def test_ingest_day_data_concurrent(trading, tmpdir):
+    filename = MARKET_DATA_FILE % ("BA", "20161222")
+    binary_filename = str(tmpdir.join("BA_20161222.npz"))
+
+    # Let concurrent writers replace the file without corrupting it.
+    results = []
+    threads = [Thread(target=lambda: results.append(
+        trading.ingest_day_data(filename, binary_filename))) for _ in
+        range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 8
+    assert len(trading.read_day_data(binary_filename)["time"]) == 395
+    assert tmpdir.listdir() == [tmpdir.join("BA_20161222.npz")]
+
+
 def test_is_trading_day(trading):
     assert not trading.is_trading_day(as_market_time(2017, 1, 22))
     assert trading.is_trading_day(as_market_time(2017, 1, 23))
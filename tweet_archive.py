@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+from simplejson import dumps
+from simplejson import loads
+from threading import RLock
+
+from logs import Logs
+
+# The file where tweets are archived, one JSON object per line.
+TWEET_ARCHIVE_FILE = "/tmp/trump2cash-tweets.jsonl"
+
+
+class TweetArchive:
+    """An append-only local archive of tweets keyed by their ID, which syncs
+    incrementally with the timeline.
+    """
+
+    def __init__(self, logs_to_cloud, filename=TWEET_ARCHIVE_FILE):
+        self.logs = Logs(name="tweet-archive", to_cloud=logs_to_cloud)
+        self.filename = filename
+        self.lock = RLock()
+        self.tweets = {}
+
+        # Whether the file ends with a line cut short by an interrupted write.
+        self.partial_line = False
+
+        self.load()
+
+    def load(self):
+        """Reads all archived tweets from the file."""
+
+        with self.lock:
+            try:
+                archive_file = open(self.filename, "r")
+            except IOError:
+                self.logs.debug("No tweet archive yet: %s", self.filename)
+                return
+
+            try:
+                for line in archive_file:
+                    self.partial_line = not line.endswith("\n")
+
+                    # Skip lines cut short by an interrupted write.
+                    try:
+                        tweet = loads(line)
+                    except ValueError:
+                        self.logs.warn("Skipping bad archive line: %s", line)
+                        continue
+                    self.tweets[tweet["id_str"]] = tweet
+            finally:
+                archive_file.close()
+
+            self.logs.debug("Loaded %s archived tweets.", len(self.tweets))
+
+    def add(self, tweets):
+        """Appends the tweets which aren't archived yet to the file."""
+
+        with self.lock:
+            new_tweets = []
+            for tweet in tweets:
+                if tweet["id_str"] not in self.tweets:
+                    self.tweets[tweet["id_str"]] = tweet
+                    new_tweets.append(tweet)
+
+            if not new_tweets:
+                return 0
+
+            archive_file = open(self.filename, "a")
+            try:
+                # Start on a new line after a partial one.
+                if self.partial_line:
+                    archive_file.write("\n")
+                    self.partial_line = False
+                archive_file.write("".join(["%s\n" % dumps(tweet) for tweet
+                                            in new_tweets]))
+            finally:
+                archive_file.close()
+
+            self.logs.debug("Archived %s new tweets.", len(new_tweets))
+            return len(new_tweets)
+
+    def get_min_id(self):
+        """Returns the lowest archived tweet ID or None if there are none."""
+
+        with self.lock:
+            if not self.tweets:
+                return None
+            return min([int(id_str) for id_str in self.tweets])
+
+    def get_max_id(self):
+        """Returns the highest archived tweet ID or None if there are none."""
+
+        with self.lock:
+            if not self.tweets:
+                return None
+            return max([int(id_str) for id_str in self.tweets])
+
+    def sync(self, twitter, since_id):
+        """Archives the tweets since the specified ID which are newer than the
+        archived ones, or all of them if the archive doesn't go back as far.
+        """
+
+        min_id = self.get_min_id()
+        max_id = self.get_max_id()
+        if min_id is None or int(since_id) < min_id:
+            sync_id = since_id
+        else:
+            sync_id = str(max_id + 1)
+
+        self.logs.debug("Syncing tweet archive since: %s", sync_id)
+        return self.add(twitter.get_tweets(sync_id))
+
+    def get_tweets(self, since_id):
+        """Returns the archived tweets since the specified ID, newest first
+        like the timeline.
+        """
+
+        with self.lock:
+            tweets = [tweet for id_str, tweet in self.tweets.iteritems() if
+                      int(id_str) >= int(since_id)]
+
+        return sorted(tweets, key=lambda tweet: int(tweet["id_str"]),
+                      reverse=True)
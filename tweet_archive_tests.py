@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+from pytest import fixture
+
+from tweet_archive import TweetArchive
+
+
+class FakeTwitter:
+    def __init__(self, tweets):
+        self.tweets = tweets
+        self.since_ids = []
+
+    def get_tweets(self, since_id):
+        self.since_ids.append(since_id)
+        return [tweet for tweet in self.tweets if
+                int(tweet["id_str"]) >= int(since_id)]
+
+
+def make_tweet(id_str):
+    return {"id_str": id_str, "text": "Tweet %s" % id_str}
+
+
+@fixture
+def filename(tmpdir):
+    return str(tmpdir.join("tweets.jsonl"))
+
+
+def test_sync(filename):
+    twitter = FakeTwitter([make_tweet("300"), make_tweet("200"),
+                           make_tweet("100")])
+    archive = TweetArchive(logs_to_cloud=False, filename=filename)
+    assert archive.get_max_id() is None
+    assert archive.sync(twitter, "200") == 2
+    assert archive.get_max_id() == 300
+    assert archive.get_tweets("200") == [make_tweet("300"), make_tweet("200")]
+
+    # Only fetch the new tweets.
+    twitter.tweets.insert(0, make_tweet("400"))
+    assert archive.sync(twitter, "200") == 1
+    assert twitter.since_ids == ["200", "301"]
+
+    # Go further back than the archive.
+    assert archive.sync(twitter, "100") == 1
+    assert twitter.since_ids == ["200", "301", "100"]
+    assert archive.get_tweets("0") == [make_tweet("400"), make_tweet("300"),
+                                       make_tweet("200"), make_tweet("100")]
+
+
+def test_persistence(filename):
+    archive = TweetArchive(logs_to_cloud=False, filename=filename)
+    assert archive.add([make_tweet("100"), make_tweet("200")]) == 2
+    assert archive.add([make_tweet("200")]) == 0
+
+    # Skip a partially written line.
+    archive_file = open(filename, "a")
+    archive_file.write('{"id_str": "3')
+    archive_file.close()
+
+    archive = TweetArchive(logs_to_cloud=False, filename=filename)
+    assert archive.get_tweets("0") == [make_tweet("200"), make_tweet("100")]
+    assert archive.add([make_tweet("300")]) == 1
+
+    archive = TweetArchive(logs_to_cloud=False, filename=filename)
+    assert archive.get_tweets("0") == [make_tweet("300"), make_tweet("200"),
+                                       make_tweet("100")]
@@ -1,17 +1,29 @@
 # -*- coding: utf-8 -*-
 
+from email.utils import mktime_tz
+from email.utils import parsedate_tz
 from os import getenv
+from os import rename
+from re import compile
+from simplejson import dumps
 from simplejson import loads
+from Queue import Empty
 from Queue import Queue
 from threading import Event
-from threading import Thread
+from threading import Lock
+from threading import Semaphore
+from time import time
 from tweepy import API
 from tweepy import Cursor
 from tweepy import OAuthHandler
 from tweepy import Stream
+from tweepy import TweepError
 from tweepy.streaming import StreamListener
 
+from cache import Cache
 from logs import Logs
+from worker_pool import STOP_WORKER
+from worker_pool import WorkerPool
 
 # The keys for the Twitter account we're using for API requests and tweeting
 # alerts (@Trump2Cash). Read from environment variables.
@@ -34,45 +46,327 @@ EMOJI_THUMBS_UP = u"\U0001f44d"
 EMOJI_THUMBS_DOWN = u"\U0001f44e"
 EMOJI_SHRUG = u"¯\_(\u30c4)_/¯"
 
-# The number of worker threads processing tweets.
-NUM_THREADS = 100
+# The number of worker threads processing tweets which are always running.
+CORE_WORKERS = 2
+
+# The maximum number of worker threads processing tweets during a backlog.
+MAX_WORKERS = 100
+
+# The time in seconds after which idle extra worker threads exit.
+WORKER_IDLE_TIMEOUT = 60
+
+# The time in seconds to wait for the queued tweets to be processed when
+# shutting down.
+SHUTDOWN_TIMEOUT = 30
+
+# A pattern for the author ID in the raw JSON of a tweet. The author's user
+# object comes before those of any retweeted or quoted tweets.
+AUTHOR_ID_PATTERN = compile(
+    r'"user":\s*\{\s*"id":\s*\d+,\s*"id_str":\s*"(\d+)"')
+
+# A pattern for the ID in the raw JSON of a tweet, which follows the creation
+# time in the streaming API.
+TWEET_ID_PATTERN = compile(
+    r'^\s*\{\s*"created_at":\s*"[^"]*",\s*"id":\s*\d+,\s*"id_str":\s*"(\d+)"')
+
+# A pattern for the type of stream messages which aren't tweets.
+NOTICE_PATTERN = compile(
+    r'^\s*\{\s*"(delete|limit|scrub_geo|status_withheld|user_withheld|'
+    r'warning|disconnect)"')
+
+# The types of stream messages which are worth a warning.
+WARNING_NOTICES = ["limit", "warning", "disconnect"]
+
+# The policies for adding to a full tweet queue: wait for space or drop the
+# oldest queued tweet.
+QUEUE_POLICY_BLOCK = "block"
+QUEUE_POLICY_DROP_OLDEST = "drop_oldest"
+
+# The maximum number of tweets waiting to be processed.
+TWEET_QUEUE_SIZE = 1000
+
+# The policy for adding to a full tweet queue.
+TWEET_QUEUE_POLICY = QUEUE_POLICY_DROP_OLDEST
+
+# The maximum time in seconds a tweet may wait in the queue. Older tweets are
+# dropped, so stale signals don't get traded. None means no limit.
+TWEET_MAX_AGE = 60
+
+# The maximum number of recently seen tweet IDs remembered to skip duplicates.
+SEEN_TWEETS_SIZE = 10000
+
+# The time in seconds for which seen tweet IDs are remembered.
+SEEN_TWEETS_TTL = 24 * 60 * 60
+
+# The file where the ID of the last processed tweet is kept, so tweets
+# replayed after a restart are skipped.
+LAST_TWEET_ID_FILE = "/tmp/trump2cash-last-tweet-id"
+
+# The number of tweets per timeline request, which is the maximum allowed.
+TIMELINE_PAGE_SIZE = 200
+
+# The maximum number of missed tweets to backfill when reconnecting.
+BACKFILL_MAX_TWEETS = 200
+
+# The key marking tweets which were missed by the stream and backfilled late.
+BACKFILL_KEY = "backfill"
+
+# The maximum age in seconds of backfilled tweets to still act on. Older ones
+# are only logged, so stale signals don't get traded.
+BACKFILL_MAX_AGE = 5 * 60
 
 
 class Twitter:
     """A helper for talking to Twitter APIs."""
 
-    def __init__(self, logs_to_cloud):
+    def __init__(self, logs_to_cloud, last_tweet_id_file=None,
+                 backfill_max_age=BACKFILL_MAX_AGE):
         self.logs_to_cloud = logs_to_cloud
+        self.backfill_max_age = backfill_max_age
         self.logs = Logs(name="twitter", to_cloud=self.logs_to_cloud)
         self.twitter_auth = OAuthHandler(TWITTER_CONSUMER_KEY,
                                          TWITTER_CONSUMER_SECRET)
         self.twitter_auth.set_access_token(TWITTER_ACCESS_TOKEN,
                                            TWITTER_ACCESS_TOKEN_SECRET)
         self.twitter_api = API(self.twitter_auth)
+        self.callback = None
+        self.queue = None
+        self.workers = None
+        self.twitter_listener = None
+        self.twitter_stream = None
+
+        # Remember the tweets which were already queued or processed.
+        self.lock = Lock()
+        self.seen_tweets = Cache(max_entries=SEEN_TWEETS_SIZE,
+                                 ttl=SEEN_TWEETS_TTL)
+        self.duplicates = 0
+        self.last_tweet_id_file = last_tweet_id_file
+        self.last_tweet_id = self.load_last_tweet_id()
+
+    def start_workers(self):
+        """Creates the queue and starts the worker threads. These outlive the
+        streams, so no tweets are lost when reconnecting.
+        """
+
+        self.queue = TweetQueue(logs=self.logs)
+        self.workers = WorkerPool(name="twitter-worker", queue=self.queue,
+                                  handler=self.handle_data,
+                                  logs_to_cloud=self.logs_to_cloud,
+                                  core_workers=CORE_WORKERS,
+                                  max_workers=MAX_WORKERS,
+                                  idle_timeout=WORKER_IDLE_TIMEOUT)
+        self.workers.start()
 
     def start_streaming(self, callback):
         """Starts streaming tweets and returning data to the callback."""
 
-        self.twitter_listener = TwitterListener(
-            callback=callback, logs_to_cloud=self.logs_to_cloud)
-        twitter_stream = Stream(self.twitter_auth, self.twitter_listener)
+        self.callback = callback
+        if not self.workers:
+            self.start_workers()
+
+        twitter_listener = TwitterListener(
+            enqueue=self.enqueue, backfill=self.backfill,
+            logs_to_cloud=self.logs_to_cloud)
+        self.twitter_stream = Stream(self.twitter_auth, twitter_listener)
+        self.twitter_listener = twitter_listener
 
         self.logs.debug("Starting stream.")
-        twitter_stream.filter(follow=[TRUMP_USER_ID])
+        self.twitter_stream.filter(follow=[TRUMP_USER_ID])
 
         # If we got here because of an API error, raise it.
         if self.twitter_listener.get_error_status():
             raise Exception(self.twitter_listener.get_error_status())
 
     def stop_streaming(self):
-        """Stops the current stream."""
+        """Disconnects the current stream. The queued tweets are still
+        processed.
+        """
 
         if not self.twitter_listener:
             self.logs.warn("No stream to stop.")
             return
 
         self.logs.debug("Stopping stream.")
-        self.twitter_listener.stop_queue()
+        self.twitter_listener.stop()
+        self.twitter_stream.disconnect()
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """Stops streaming and waits up to the timeout for the queued tweets to
+        be processed. Returns whether all of them were.
+        """
+
+        if self.twitter_listener:
+            self.stop_streaming()
+
+        if not self.workers:
+            self.logs.warn("No worker threads to stop.")
+            return True
+
+        self.logs.info("Tweet queue stats: %s", self.queue.get_stats())
+        self.logs.info("Skipped duplicate tweets: %s", self.duplicates)
+        drained = self.workers.shutdown(timeout=timeout)
+        self.logs.info("Worker stats: %s", self.workers.get_stats())
+        return drained
+
+    def backfill(self):
+        """Queues the tweets since the last processed one, which the stream
+        may have missed while disconnected. They are marked with the backfill
+        key, so that stale ones aren't acted on.
+        """
+
+        if not self.last_tweet_id:
+            self.logs.debug("No last tweet to backfill from.")
+            return 0
+
+        since_id = str(int(self.last_tweet_id) + 1)
+        self.logs.debug("Backfilling tweets since: %s", since_id)
+        try:
+            tweets = self.get_tweets(since_id, limit=BACKFILL_MAX_TWEETS)
+        except TweepError as exception:
+            self.logs.error("Failed to backfill tweets: %s", exception)
+            return 0
+
+        if len(tweets) >= BACKFILL_MAX_TWEETS:
+            self.logs.warn("Backfilling only the last %s tweets.",
+                           BACKFILL_MAX_TWEETS)
+
+        # Queue the tweets in the order they were posted. Those which already
+        # came in through the stream are skipped as duplicates.
+        for tweet in reversed(tweets):
+            tweet[BACKFILL_KEY] = True
+            if not self.enqueue(dumps(tweet)):
+                break
+
+        self.logs.info("Backfilled %s tweets.", len(tweets))
+        return len(tweets)
+
+    def enqueue(self, data):
+        """Puts the raw data of a tweet on the queue unless it is a duplicate.
+        Returns False if the workers are shutting down.
+        """
+
+        tweet_id = get_tweet_id(data)
+        if tweet_id and not self.check_new_tweet(tweet_id):
+            self.logs.debug("Skipping duplicate tweet: %s", tweet_id)
+            return True
+
+        return self.workers.submit(data)
+
+    def check_new_tweet(self, tweet_id):
+        """Checks whether a tweet wasn't seen recently and isn't older than the
+        last processed one, and remembers it as seen.
+        """
+
+        with self.lock:
+            if self.last_tweet_id and int(tweet_id) <= int(self.last_tweet_id):
+                self.duplicates += 1
+                return False
+
+            try:
+                self.seen_tweets.get(tweet_id)
+                self.duplicates += 1
+                return False
+            except KeyError:
+                self.seen_tweets.put(tweet_id, True)
+                return True
+
+    def load_last_tweet_id(self):
+        """Reads the ID of the last processed tweet, if it was persisted."""
+
+        if not self.last_tweet_id_file:
+            return None
+
+        try:
+            id_file = open(self.last_tweet_id_file, "r")
+        except IOError:
+            self.logs.debug("No last tweet ID yet: %s",
+                            self.last_tweet_id_file)
+            return None
+
+        try:
+            last_tweet_id = id_file.read().strip()
+        finally:
+            id_file.close()
+
+        if not last_tweet_id.isdigit():
+            self.logs.warn("Bad last tweet ID: %s", last_tweet_id)
+            return None
+
+        self.logs.debug("Loaded last tweet ID: %s", last_tweet_id)
+        return last_tweet_id
+
+    def set_last_tweet_id(self, tweet_id):
+        """Remembers the tweet as processed if it is newer than the last one
+        and persists its ID.
+        """
+
+        with self.lock:
+            if self.last_tweet_id and int(tweet_id) <= int(self.last_tweet_id):
+                return
+            self.last_tweet_id = tweet_id
+
+            if not self.last_tweet_id_file:
+                return
+
+            # Write to a temporary file first so a crash can't leave a partial
+            # ID behind.
+            temp_filename = "%s.tmp" % self.last_tweet_id_file
+            try:
+                temp_file = open(temp_filename, "w")
+                try:
+                    temp_file.write(tweet_id)
+                finally:
+                    temp_file.close()
+                rename(temp_filename, self.last_tweet_id_file)
+            except (IOError, OSError) as exception:
+                self.logs.error("Failed to persist last tweet ID: %s",
+                                exception)
+
+    def handle_data(self, logs, data):
+        """Sanity-checks and extracts the data before sending it to the
+        callback.
+        """
+
+        try:
+            tweet = loads(data)
+        except ValueError:
+            logs.error("Failed to decode JSON data: %s", data)
+            return
+
+        try:
+            user_id_str = tweet["user"]["id_str"]
+            screen_name = tweet["user"]["screen_name"]
+        except KeyError:
+            logs.error("Malformed tweet: %s", tweet)
+            return
+
+        # We're only interested in tweets from Mr. Trump himself, so skip the
+        # rest.
+        if user_id_str != TRUMP_USER_ID:
+            logs.debug("Skipping tweet from user: %s (%s)",
+                       screen_name, user_id_str)
+            return
+
+        # Don't act on backfilled tweets which are too old or of unknown age,
+        # but don't backfill them again either.
+        if tweet.get(BACKFILL_KEY):
+            age = get_tweet_age(tweet)
+            if age is None or age > self.backfill_max_age:
+                logs.warn("Skipping stale backfilled tweet (%s s old): %s",
+                          age, tweet)
+                if "id_str" in tweet:
+                    self.set_last_tweet_id(tweet["id_str"])
+                return
+
+        logs.info("Examining tweet: %s", tweet)
+
+        # Call the callback. Remember the tweet as processed either way, so a
+        # failure after trading can't lead to a second trade.
+        try:
+            self.callback(tweet)
+        finally:
+            if "id_str" in tweet:
+                self.set_last_tweet_id(tweet["id_str"])
 
     def tweet(self, companies, tweet):
         """Posts a tweet listing the companies, their ticker symbols, and a
@@ -82,7 +376,7 @@ class Twitter:
         link = self.get_tweet_link(tweet)
         text = self.make_tweet_text(companies, link)
 
-        self.logs.info("Tweeting: %s" % text)
+        self.logs.info("Tweeting: %s", text)
         self.twitter_api.update_status(text)
 
     def make_tweet_text(self, companies, link):
@@ -120,27 +414,31 @@ class Twitter:
 
         statuses = self.twitter_api.statuses_lookup([tweet_id])
         if not statuses or len(statuses) != 1:
-            self.logs.error("Bad statuses response: %s" % statuses)
+            self.logs.error("Bad statuses response: %s", statuses)
             return None
 
         # Use the raw JSON, just like the streaming API.
         return statuses[0]._json
 
-    def get_tweets(self, since_id):
-        """Looks up metadata for all Trump tweets since the specified ID."""
+    def get_tweets(self, since_id, limit=None):
+        """Looks up metadata for all Trump tweets since the specified ID, or
+        only the newest ones up to the limit.
+        """
 
         # Include the first ID by passing along an earlier one.
         since_id = str(int(since_id) - 1)
 
+        # Request full pages to minimize the number of requests.
+        cursor = Cursor(self.twitter_api.user_timeline, user_id=TRUMP_USER_ID,
+                        since_id=since_id, count=TIMELINE_PAGE_SIZE)
+
         tweets = []
-        for status in Cursor(self.twitter_api.user_timeline,
-                             user_id=TRUMP_USER_ID,
-                             since_id=since_id).items():
+        for status in cursor.items(limit or 0):
 
             # Use the raw JSON, just like the streaming API.
             tweets.append(status._json)
 
-        self.logs.debug("Got tweets: %s" % tweets)
+        self.logs.debug("Got tweets: %s", tweets)
 
         return tweets
 
@@ -155,7 +453,7 @@ class Twitter:
             screen_name = tweet["user"]["screen_name"]
             id_str = tweet["id_str"]
         except KeyError:
-            self.logs.error("Malformed tweet for link: %s" % tweet)
+            self.logs.error("Malformed tweet for link: %s", tweet)
             return None
 
         link = TWEET_URL % (screen_name, id_str)
@@ -165,66 +463,29 @@ class Twitter:
 class TwitterListener(StreamListener):
     """A listener class for handling streaming Twitter data."""
 
-    def __init__(self, callback, logs_to_cloud):
+    def __init__(self, enqueue, backfill, logs_to_cloud):
         self.logs_to_cloud = logs_to_cloud
         self.logs = Logs(name="twitter-listener", to_cloud=self.logs_to_cloud)
-        self.callback = callback
+        self.enqueue = enqueue
+        self.backfill = backfill
         self.error_status = None
-        self.start_queue()
-
-    def start_queue(self):
-        """Creates a queue and starts the worker threads."""
-
-        self.queue = Queue()
         self.stop_event = Event()
-        self.logs.debug("Starting %s worker threads." % NUM_THREADS)
-        self.workers = []
-        for worker_id in range(NUM_THREADS):
-            worker = Thread(target=self.process_queue, args=[worker_id])
-            worker.daemon = True
-            worker.start()
-            self.workers.append(worker)
 
-    def stop_queue(self):
-        """Shuts down the worker threads."""
-
-        if not self.workers:
-            self.logs.warn("No worker threads to stop.")
-            return
+    def stop(self):
+        """Makes the stream disconnect with the next data."""
 
         self.stop_event.set()
-        for worker in self.workers:
-            # Terminate the thread immediately.
-            worker.join(0)
-
-    def process_queue(self, worker_id):
-        """Continuously processes tasks on the queue."""
-
-        # Create a new logs instance (with its own httplib2 instance) so that
-        # there is a separate one for each thread.
-        logs = Logs("twitter-listener-worker-%s" % worker_id,
-                    to_cloud=self.logs_to_cloud)
-
-        logs.debug("Started worker thread: %s" % worker_id)
-        while not self.stop_event.is_set():
-            # The main loop doesn't catch and report exceptions from background
-            # threads, so do that here.
-            try:
-                size = self.queue.qsize()
-                logs.debug("Processing queue of size: %s" % size)
-                data = self.queue.get(block=True)
-                self.handle_data(logs, data)
-                self.queue.task_done()
-            except BaseException as exception:
-                logs.catch(exception)
-        logs.debug("Stopped worker thread: %s" % worker_id)
+
+    def on_connect(self):
+        """Catches up on missed tweets before reading from the new stream."""
+
+        self.backfill()
 
     def on_error(self, status):
         """Handles any API errors."""
 
-        self.logs.error("Twitter error: %s" % status)
+        self.logs.error("Twitter error: %s", status)
         self.error_status = status
-        self.stop_queue()
         return False
 
     def get_error_status(self):
@@ -238,36 +499,215 @@ class TwitterListener(StreamListener):
         if self.stop_event.is_set():
             return False
 
-        # Put the task on the queue and keep streaming.
-        self.queue.put(data)
+        # Skip anything that can't be a tweet by Mr. Trump before decoding.
+        if not self.prefilter_data(data):
+            return True
+
+        # Put the task on the queue and keep streaming, unless the workers
+        # are shutting down.
+        return self.enqueue(data)
+
+    def prefilter_data(self, data):
+        """Cheaply checks whether the raw data may be a tweet from Mr. Trump,
+        without decoding the JSON.
+        """
+
+        # Skip keep-alive messages.
+        if not data or data.isspace():
+            return False
+
+        # Skip notices about deleted tweets, rate limits, etc.
+        notice = get_notice(data)
+        if notice:
+            if notice in WARNING_NOTICES:
+                self.logs.warn("Stream notice: %s", data)
+            return False
+
+        # Skip tweets from other users, like retweets and replies. Let the
+        # full check decide if there is no author ID.
+        author_id = get_author_id(data)
+        if author_id and author_id != TRUMP_USER_ID:
+            return False
+
         return True
 
-    def handle_data(self, logs, data):
-        """Sanity-checks and extracts the data before sending it to the
-        callback.
+
+def get_notice(data):
+    """Finds the type of a stream message which isn't a tweet, if it is one.
+    """
+
+    match = NOTICE_PATTERN.match(data)
+    if not match:
+        return None
+    return match.group(1)
+
+
+def get_tweet_id(data):
+    """Finds the ID of a tweet in its raw JSON, decoding it only if the ID
+    isn't where the streaming API puts it.
+    """
+
+    match = TWEET_ID_PATTERN.match(data)
+    if match:
+        return match.group(1)
+
+    try:
+        return loads(data)["id_str"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def get_tweet_age(tweet):
+    """Calculates the time in seconds since a tweet was posted or returns None
+    if it is unknown.
+    """
+
+    try:
+        created_at = parsedate_tz(tweet["created_at"])
+    except (KeyError, TypeError, AttributeError):
+        return None
+    if not created_at:
+        return None
+
+    return time() - mktime_tz(created_at)
+
+
+def get_author_id(data):
+    """Finds the author ID in the raw JSON of a tweet, if there is one."""
+
+    match = AUTHOR_ID_PATTERN.search(data)
+    if not match:
+        return None
+    return match.group(1)
+
+
+class TweetQueue:
+    """A bounded queue of raw tweet data, which handles a full queue according
+    to a policy and drops tweets that waited too long. It counts the queued
+    and dropped tweets and the ages of tweets when they are taken out. The
+    stop items of the worker pool bypass the bound, the counters and the age
+    check.
+    """
+
+    def __init__(self, logs, max_size=TWEET_QUEUE_SIZE,
+                 policy=TWEET_QUEUE_POLICY, max_age=TWEET_MAX_AGE):
+        self.logs = logs
+        self.policy = policy
+        self.max_age = max_age
+        self.lock = Lock()
+
+        # The queue itself is unbounded, so stop items always fit. The space
+        # for tweets is limited separately.
+        self.queue = Queue()
+        self.space = Semaphore(max_size)
+        self.size = 0
+
+        # The counters for monitoring.
+        self.queued = 0
+        self.dropped_full = 0
+        self.dropped_stale = 0
+        self.dequeued = 0
+        self.total_age = 0.0
+        self.max_dequeued_age = 0.0
+
+    def put(self, data):
+        """Adds tweet data, either waiting for space or dropping the oldest
+        tweet if the queue is full.
         """
 
-        try:
-            tweet = loads(data)
-        except ValueError:
-            logs.error("Failed to decode JSON data: %s" % data)
+        # Never wait for space for or drop stop items.
+        if data is STOP_WORKER:
+            self.queue.put((None, data))
             return
 
+        if self.policy == QUEUE_POLICY_BLOCK:
+            self.space.acquire()
+        else:
+            while not self.space.acquire(False):
+                self.drop_oldest()
+
+        with self.lock:
+            self.queued += 1
+            self.size += 1
+        self.queue.put((time(), data))
+
+    def drop_oldest(self):
+        """Removes the oldest tweet data to make space."""
+
         try:
-            user_id_str = tweet["user"]["id_str"]
-            screen_name = tweet["user"]["screen_name"]
-        except KeyError:
-            logs.error("Malformed tweet: %s" % tweet)
+            enqueued, data = self.queue.get_nowait()
+        except Empty:
             return
+        self.queue.task_done()
 
-        # We're only interested in tweets from Mr. Trump himself, so skip the
-        # rest.
-        if user_id_str != TRUMP_USER_ID:
-            logs.debug("Skipping tweet from user: %s (%s)" %
-                       (screen_name, user_id_str))
+        # Keep stop items, but move them behind the remaining tweets.
+        if data is STOP_WORKER:
+            self.queue.put((None, data))
             return
 
-        logs.info("Examining tweet: %s" % tweet)
+        self.space.release()
+        with self.lock:
+            self.size -= 1
+            self.dropped_full += 1
+            dropped_full = self.dropped_full
+        self.logs.warn("Dropped oldest tweet from full queue (%s total).",
+                       dropped_full)
+
+    def get(self, timeout=None):
+        """Takes out the oldest tweet data which isn't too old, waiting until
+        there is some. Raises Empty after the timeout, if there is one.
+        """
+
+        while True:
+            enqueued, data = self.queue.get(timeout=timeout)
+            if data is STOP_WORKER:
+                return data
+
+            self.space.release()
+            age = time() - enqueued
+            with self.lock:
+                self.size -= 1
+
+            if self.max_age is not None and age > self.max_age:
+                self.queue.task_done()
+                with self.lock:
+                    self.dropped_stale += 1
+                    dropped_stale = self.dropped_stale
+                self.logs.warn("Dropped stale tweet after %.3f s (%s total).",
+                               age, dropped_stale)
+                continue
+
+            with self.lock:
+                self.dequeued += 1
+                self.total_age += age
+                self.max_dequeued_age = max(self.max_dequeued_age, age)
+            return data
+
+    def task_done(self):
+        """Marks the tweet data from get as processed."""
+
+        self.queue.task_done()
+
+    def qsize(self):
+        """Returns the approximate number of queued tweets."""
+
+        with self.lock:
+            return self.size
+
+    def get_stats(self):
+        """Returns the counters and the mean and maximum age of the tweets
+        taken out of the queue.
+        """
 
-        # Call the callback.
-        self.callback(tweet)
+        with self.lock:
+            if self.dequeued:
+                mean_age = self.total_age / self.dequeued
+            else:
+                mean_age = 0.0
+            return {"queued": self.queued,
+                    "dropped_full": self.dropped_full,
+                    "dropped_stale": self.dropped_stale,
+                    "dequeued": self.dequeued,
+                    "mean_age": mean_age,
+                    "max_age": self.max_dequeued_age,
+                    "size": self.size}
@@ -1,14 +1,32 @@
 # -*- coding: utf-8 -*-
 
+from collections import OrderedDict
+from datetime import datetime
+from datetime import timedelta
 from pytest import fixture
+from pytest import raises
+from Queue import Empty
+from simplejson import dumps
+from threading import Thread
 from threading import Timer
 from time import sleep
 
+from logs import Logs
+from twitter import BACKFILL_KEY
+from twitter import get_author_id
+from twitter import get_notice
+from twitter import get_tweet_age
+from twitter import get_tweet_id
+from twitter import QUEUE_POLICY_BLOCK
+from twitter import QUEUE_POLICY_DROP_OLDEST
+from twitter import TweetQueue
 from twitter import Twitter
+from twitter import TwitterListener
 from twitter import TWITTER_CONSUMER_KEY
 from twitter import TWITTER_CONSUMER_SECRET
 from twitter import TWITTER_ACCESS_TOKEN
 from twitter import TWITTER_ACCESS_TOKEN_SECRET
+from worker_pool import STOP_WORKER
 
 
 @fixture
@@ -97,3 +115,255 @@ def test_get_tweet_link(twitter):
     tweet = twitter.get_tweet("828574430800539648")
     assert twitter.get_tweet_link(tweet) == (
         "https://twitter.com/realDonaldTrump/status/828574430800539648")
+
+
+@fixture
+def logs():
+    return Logs(name="twitter-test", to_cloud=False)
+
+
+def test_tweet_queue_drop_oldest(logs):
+    queue = TweetQueue(logs, max_size=2, policy=QUEUE_POLICY_DROP_OLDEST,
+                       max_age=None)
+    queue.put("1")
+    queue.put("2")
+    queue.put("3")
+    assert queue.get() == "2"
+    assert queue.get() == "3"
+    with raises(Empty):
+        queue.get(timeout=0.01)
+    stats = queue.get_stats()
+    assert stats["queued"] == 3
+    assert stats["dropped_full"] == 1
+    assert stats["dequeued"] == 2
+
+
+def test_tweet_queue_block(logs):
+    queue = TweetQueue(logs, max_size=1, policy=QUEUE_POLICY_BLOCK,
+                       max_age=None)
+    queue.put("1")
+    putter = Thread(target=queue.put, args=["2"])
+    putter.start()
+    sleep(0.1)
+    assert putter.is_alive()
+    assert queue.get() == "1"
+    putter.join(1)
+    assert queue.get() == "2"
+    assert queue.get_stats()["dropped_full"] == 0
+
+
+def test_tweet_queue_max_age(logs):
+    queue = TweetQueue(logs, max_size=10, max_age=0.1)
+    queue.put("1")
+    sleep(0.2)
+    queue.put("2")
+    assert queue.get() == "2"
+    stats = queue.get_stats()
+    assert stats["dropped_stale"] == 1
+    assert stats["dequeued"] == 1
+    assert stats["max_age"] < 0.1
+
+
+def test_tweet_queue_stop(logs):
+    queue = TweetQueue(logs, max_size=1, policy=QUEUE_POLICY_DROP_OLDEST,
+                       max_age=0.1)
+    queue.put("1")
+
+    # Add stop items beyond the bound without counting or dropping tweets.
+    queue.put(STOP_WORKER)
+    queue.put(STOP_WORKER)
+    assert queue.qsize() == 1
+    assert queue.get_stats()["queued"] == 1
+
+    # Only drop tweets when the queue is full.
+    queue.put("2")
+    assert queue.get() is STOP_WORKER
+    queue.put("3")
+    assert queue.get_stats()["dropped_full"] == 2
+
+    # Don't drop stop items as stale.
+    sleep(0.2)
+    assert queue.get() is STOP_WORKER
+    with raises(Empty):
+        queue.get(timeout=0.01)
+    stats = queue.get_stats()
+    assert stats["queued"] == 3
+    assert stats["dropped_stale"] == 1
+    assert stats["dequeued"] == 0
+    assert stats["size"] == 0
+
+
+def make_status(user_id_str, text, retweeted_status=None,
+                id_str="821415698278875137",
+                created_at="Tue Jan 17 13:12:49 +0000 2017"):
+    # Use the same key order as the streaming API.
+    status = OrderedDict()
+    status["created_at"] = created_at
+    status["id"] = int(id_str)
+    status["id_str"] = id_str
+    status["text"] = text
+    status["in_reply_to_user_id_str"] = "25073877"
+    status["user"] = OrderedDict([
+        ("id", int(user_id_str)),
+        ("id_str", user_id_str),
+        ("screen_name", "someone")])
+    status["entities"] = {"user_mentions": [{
+        "id": 25073877,
+        "id_str": "25073877",
+        "screen_name": "realDonaldTrump"}]}
+    if retweeted_status:
+        status["retweeted_status"] = retweeted_status
+    return status
+
+
+def test_get_author_id():
+    tweet = make_status("25073877", "Buy American!")
+    assert get_author_id(dumps(tweet)) == "25073877"
+    assert get_author_id(dumps(tweet, separators=(",", ":"))) == "25073877"
+    retweet = make_status("123", "RT @realDonaldTrump: Buy American!",
+                          retweeted_status=tweet)
+    assert get_author_id(dumps(retweet)) == "123"
+    assert get_author_id(dumps(retweet, separators=(",", ":"))) == "123"
+    assert get_author_id('{"text": "no user"}') is None
+
+
+def test_get_notice():
+    assert get_notice('{"delete":{"status":{"id":1234,"id_str":"1234",'
+                      '"user_id":3,"user_id_str":"3"}}}') == "delete"
+    assert get_notice('{"limit":{"track":1234}}') == "limit"
+    assert get_notice('{"disconnect":{"code":4,"stream_name":"x",'
+                      '"reason":"y"}}') == "disconnect"
+    assert get_notice(dumps(make_status("25073877", "limit"))) is None
+
+
+def test_stream_handoff(twitter):
+    tweets = []
+    twitter.callback = tweets.append
+    twitter.start_workers()
+
+    # Keep the workers and the queued tweets when the stream is replaced.
+    listener = TwitterListener(enqueue=twitter.enqueue,
+                               backfill=twitter.backfill, logs_to_cloud=False)
+    assert listener.on_data(dumps(make_status("25073877", "Buy American!")))
+    listener.stop()
+    assert not listener.on_data(dumps(make_status("25073877", "Hire!")))
+    listener = TwitterListener(enqueue=twitter.enqueue,
+                               backfill=twitter.backfill, logs_to_cloud=False)
+    assert listener.on_data(dumps(make_status("25073877", "Hire American!",
+                                              id_str="821415698278875138")))
+
+    assert twitter.shutdown(timeout=1)
+    assert sorted([tweet["text"] for tweet in tweets]) == ["Buy American!",
+                                                          "Hire American!"]
+    tweet = make_status("25073877", "Again!", id_str="821415698278875139")
+    assert not listener.on_data(dumps(tweet))
+
+
+def test_get_tweet_id():
+    tweet = make_status("25073877", "Buy American!")
+    assert get_tweet_id(dumps(tweet)) == "821415698278875137"
+    assert get_tweet_id(dumps(tweet, separators=(",", ":"))) == (
+        "821415698278875137")
+
+    # Decode the JSON if the ID isn't first.
+    tweet = OrderedDict(reversed(tweet.items()))
+    assert get_tweet_id(dumps(tweet)) == "821415698278875137"
+    assert get_tweet_id("{}") is None
+    assert get_tweet_id("{") is None
+
+
+def test_duplicates(tmpdir):
+    last_tweet_id_file = str(tmpdir.join("last-tweet-id"))
+    twitter = Twitter(logs_to_cloud=False,
+                      last_tweet_id_file=last_tweet_id_file)
+    tweets = []
+    twitter.callback = tweets.append
+    twitter.start_workers()
+
+    # Skip the same tweet when streamed again.
+    first = dumps(make_status("25073877", "Buy American!", id_str="100"))
+    second = dumps(make_status("25073877", "Hire American!", id_str="200"))
+    assert twitter.enqueue(first)
+    assert twitter.enqueue(second)
+    assert twitter.enqueue(first)
+    assert twitter.shutdown(timeout=1)
+    assert sorted([tweet["id_str"] for tweet in tweets]) == ["100", "200"]
+    assert twitter.duplicates == 1
+
+    # Skip tweets up to the last processed one after a restart.
+    twitter = Twitter(logs_to_cloud=False,
+                      last_tweet_id_file=last_tweet_id_file)
+    assert twitter.last_tweet_id == "200"
+    twitter.callback = tweets.append
+    twitter.start_workers()
+    third = dumps(make_status("25073877", "Build!", id_str="300"))
+    assert twitter.enqueue(first)
+    assert twitter.enqueue(second)
+    assert twitter.enqueue(third)
+    assert twitter.shutdown(timeout=1)
+    assert sorted([tweet["id_str"] for tweet in tweets]) == [
+        "100", "200", "300"]
+    assert twitter.duplicates == 2
+
+
+def test_backfill(twitter):
+    tweets = []
+    twitter.callback = tweets.append
+    twitter.start_workers()
+    since_ids = []
+
+    def get_tweets(since_id, limit=None):
+        since_ids.append(since_id)
+        return [make_status("25073877", "Hire American!", id_str="300",
+                            created_at=get_created_at(60)),
+                make_status("25073877", "Buy American!", id_str="200",
+                            created_at=get_created_at(120))]
+
+    # Nothing to backfill without a last processed tweet.
+    twitter.get_tweets = get_tweets
+    assert twitter.backfill() == 0
+
+    # Queue the missed tweets, except those which were streamed already.
+    twitter.last_tweet_id = "100"
+    assert twitter.enqueue(dumps(make_status("25073877", "Buy American!",
+                                             id_str="200")))
+    assert twitter.backfill() == 2
+    assert since_ids == ["101"]
+    assert twitter.shutdown(timeout=1)
+    assert sorted([(tweet["id_str"], BACKFILL_KEY in tweet) for tweet in
+                   tweets]) == [("200", False), ("300", True)]
+    assert twitter.last_tweet_id == "300"
+
+
+def get_created_at(age):
+    created_at = datetime.utcnow() - timedelta(seconds=age)
+    return created_at.strftime("%a %b %d %H:%M:%S +0000 %Y")
+
+
+def test_get_tweet_age():
+    assert 59 < get_tweet_age({"created_at": get_created_at(60)}) < 62
+    assert get_tweet_age({"created_at": "yesterday"}) is None
+    assert get_tweet_age({}) is None
+
+
+def test_backfill_stale(twitter):
+    tweets = []
+    twitter.callback = tweets.append
+    twitter.backfill_max_age = 300
+    twitter.start_workers()
+
+    def get_tweets(since_id, limit=None):
+        return [make_status("25073877", "Hire American!", id_str="400",
+                            created_at=get_created_at(60)),
+                make_status("25073877", "Buy American!", id_str="300",
+                            created_at=get_created_at(24 * 60 * 60)),
+                make_status("25073877", "Build!", id_str="200",
+                            created_at="yesterday")]
+
+    # Only act on the recent tweets, but mark all of them as processed.
+    twitter.get_tweets = get_tweets
+    twitter.last_tweet_id = "100"
+    assert twitter.backfill() == 3
+    assert twitter.shutdown(timeout=1)
+    assert [tweet["id_str"] for tweet in tweets] == ["400"]
+    assert twitter.last_tweet_id == "400"
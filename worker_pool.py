@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+from Queue import Empty
+from threading import Event
+from threading import Lock
+from threading import Thread
+from time import time
+
+from logs import Logs
+
+# The item telling a worker to exit once the items before it are processed.
+STOP_WORKER = object()
+
+
+class WorkerPool:
+    """An elastic pool of worker threads processing the items of a queue. It
+    keeps a core of workers and adds more up to a maximum while there is a
+    backlog. The extra workers exit again after being idle for a while.
+    """
+
+    def __init__(self, name, queue, handler, logs_to_cloud, core_workers,
+                 max_workers, idle_timeout):
+        self.logs = Logs(name=name, to_cloud=logs_to_cloud)
+        self.queue = queue
+        self.handler = handler
+        self.core_workers = core_workers
+        self.max_workers = max_workers
+        self.idle_timeout = idle_timeout
+        self.stop_event = Event()
+        self.lock = Lock()
+        self.threads = []
+        self.next_worker_id = 0
+
+        # The counters for monitoring.
+        self.num_workers = 0
+        self.num_busy = 0
+        self.peak_workers = 0
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.exited_seconds = 0.0
+        self.start_times = {}
+
+    def start(self):
+        """Starts the core workers."""
+
+        self.logs.debug("Starting %s core workers.", self.core_workers)
+        with self.lock:
+            for _ in range(self.core_workers):
+                self.add_worker()
+
+    def shutdown(self, timeout=None):
+        """Stops adding workers and lets the existing ones exit after
+        processing the queued items. Waits for that up to the timeout and
+        returns whether all workers exited. Later calls only wait.
+        """
+
+        with self.lock:
+            shut_down = self.stop_event.is_set()
+            self.stop_event.set()
+            num_workers = self.num_workers
+
+        # Queue one stop item per worker behind the remaining items, but only
+        # once, so that no stop items are left over.
+        if shut_down:
+            self.logs.debug("Waiting for workers: %s", self.get_stats())
+        else:
+            self.logs.debug("Shutting down workers: %s", self.get_stats())
+            for _ in range(num_workers):
+                self.queue.put(STOP_WORKER)
+
+        deadline = None if timeout is None else time() + timeout
+        for thread in list(self.threads):
+            if deadline is None:
+                thread.join()
+            else:
+                thread.join(max(0, deadline - time()))
+
+        stopped = not any([thread.is_alive() for thread in self.threads])
+        if not stopped:
+            self.logs.warn("Workers didn't finish in time: %s",
+                           self.get_stats())
+        return stopped
+
+    def submit(self, item):
+        """Puts an item on the queue and adds a worker if there is a backlog.
+        Returns False after shutdown.
+        """
+
+        if self.stop_event.is_set():
+            self.logs.warn("Not submitting item after shutdown.")
+            return False
+
+        self.queue.put(item)
+
+        with self.lock:
+            idle = self.num_workers - self.num_busy
+            if (self.queue.qsize() > idle and
+                    self.num_workers < self.max_workers and
+                    not self.stop_event.is_set()):
+                self.add_worker()
+
+        return True
+
+    def add_worker(self):
+        """Starts a new worker thread. Expects the lock to be held."""
+
+        worker_id = self.next_worker_id
+        self.next_worker_id += 1
+        self.num_workers += 1
+        self.peak_workers = max(self.peak_workers, self.num_workers)
+        self.start_times[worker_id] = time()
+
+        thread = Thread(target=self.work, args=[worker_id])
+        thread.daemon = True
+        self.threads = [existing for existing in self.threads if
+                        existing.is_alive()]
+        self.threads.append(thread)
+        thread.start()
+
+    def work(self, worker_id):
+        """Processes items from the queue until told to stop or idle for too
+        long.
+        """
+
+        self.logs.debug("Started worker: %s", worker_id)
+        while True:
+            try:
+                item = self.queue.get(timeout=self.idle_timeout)
+            except Empty:
+                # Let the extra workers exit when idle.
+                with self.lock:
+                    if self.num_workers > self.core_workers:
+                        self.remove_worker(worker_id)
+                        self.logs.debug("Idle worker exiting: %s", worker_id)
+                        return
+                continue
+
+            if item is STOP_WORKER:
+                self.queue.task_done()
+                break
+
+            with self.lock:
+                self.num_busy += 1
+            start = time()
+
+            # The main loop doesn't catch and report exceptions from background
+            # threads, so do that here.
+            try:
+                self.handler(self.logs, item)
+            except BaseException as exception:
+                self.logs.catch(exception)
+            finally:
+                with self.lock:
+                    self.num_busy -= 1
+                    self.processed += 1
+                    self.busy_seconds += time() - start
+                self.queue.task_done()
+
+        with self.lock:
+            self.remove_worker(worker_id)
+        self.logs.debug("Stopped worker: %s", worker_id)
+
+    def remove_worker(self, worker_id):
+        """Accounts for an exiting worker. Expects the lock to be held."""
+
+        self.num_workers -= 1
+        self.exited_seconds += time() - self.start_times.pop(worker_id)
+
+    def get_stats(self):
+        """Returns the worker counts and the utilization, i.e. the share of
+        the worker time spent processing items.
+        """
+
+        with self.lock:
+            now = time()
+            worker_seconds = self.exited_seconds + sum(
+                [now - start for start in self.start_times.values()])
+            if worker_seconds > 0:
+                utilization = self.busy_seconds / worker_seconds
+            else:
+                utilization = 0.0
+            return {"workers": self.num_workers,
+                    "busy": self.num_busy,
+                    "peak_workers": self.peak_workers,
+                    "processed": self.processed,
+                    "utilization": utilization}
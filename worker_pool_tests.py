@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+from Queue import Queue
+from threading import Event
+from time import sleep
+from time import time
+
+from worker_pool import WorkerPool
+
+
+def wait_for(condition, timeout=5):
+    deadline = time() + timeout
+    while not condition() and time() < deadline:
+        sleep(0.01)
+    return condition()
+
+
+def test_grow_and_shrink():
+    release = Event()
+    processed = []
+
+    def handler(logs, item):
+        release.wait()
+        processed.append(item)
+
+    pool = WorkerPool(name="test-worker", queue=Queue(), handler=handler,
+                      logs_to_cloud=False, core_workers=2, max_workers=4,
+                      idle_timeout=0.1)
+    pool.start()
+    assert pool.get_stats()["workers"] == 2
+
+    # Add workers for the backlog up to the maximum.
+    for item in range(10):
+        pool.submit(item)
+    assert wait_for(lambda: pool.get_stats()["busy"] == 4)
+    assert pool.get_stats()["workers"] == 4
+
+    # Let the extra workers exit when idle.
+    release.set()
+    assert wait_for(lambda: pool.get_stats()["workers"] == 2)
+    stats = pool.get_stats()
+    assert sorted(processed) == range(10)
+    assert stats["processed"] == 10
+    assert stats["peak_workers"] == 4
+    assert 0 < stats["utilization"] < 1
+
+    assert pool.shutdown(timeout=1)
+    assert pool.get_stats()["workers"] == 0
+
+
+def test_handler_exception():
+    def handler(logs, item):
+        if item == 0:
+            raise ValueError("Bad item.")
+
+    queue = Queue()
+    pool = WorkerPool(name="test-worker", queue=queue, handler=handler,
+                      logs_to_cloud=False, core_workers=1, max_workers=1,
+                      idle_timeout=0.1)
+    pool.start()
+    pool.submit(0)
+    pool.submit(1)
+    queue.join()
+    assert pool.get_stats()["processed"] == 2
+    assert pool.shutdown(timeout=1)
+
+
+def test_shutdown():
+    release = Event()
+    processed = []
+
+    def handler(logs, item):
+        release.wait()
+        processed.append(item)
+
+    pool = WorkerPool(name="test-worker", queue=Queue(), handler=handler,
+                      logs_to_cloud=False, core_workers=1, max_workers=1,
+                      idle_timeout=60)
+    pool.start()
+    for item in range(3):
+        pool.submit(item)
+
+    # Give up on the blocked items after the timeout.
+    assert not pool.shutdown(timeout=0.1)
+    assert not pool.submit(3)
+
+    # Process the queued items before exiting.
+    release.set()
+    assert pool.shutdown(timeout=1)
+    assert processed == [0, 1, 2]
+    assert pool.get_stats()["workers"] == 0
+
+
+def test_shutdown_twice():
+    release = Event()
+
+    def handler(logs, item):
+        release.wait()
+
+    queue = Queue()
+    pool = WorkerPool(name="test-worker", queue=queue, handler=handler,
+                      logs_to_cloud=False, core_workers=2, max_workers=2,
+                      idle_timeout=60)
+    pool.start()
+    pool.submit(0)
+    pool.submit(1)
+
+    # Queue the stop items only once.
+    assert not pool.shutdown(timeout=0.1)
+    assert not pool.shutdown(timeout=0.1)
+    release.set()
+    assert pool.shutdown(timeout=1)
+    assert pool.shutdown(timeout=1)
+    assert queue.empty()
+    assert pool.get_stats()["processed"] == 2